@@ -0,0 +1,36 @@
+"""Benchmark the time taken to import pgsheets, each in a new interpreter.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_import.py [repeat]
+"""
+import sys
+import os
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+MODULES = ['pgsheets', 'pgsheets.token', 'pgsheets.models']
+
+CODE = """
+import time
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def import_time(module):
+    out = subprocess.check_output(
+        [sys.executable, '-c', CODE.format(module=module)], cwd=ROOT)
+    return float(out)
+
+
+def main(repeat=5):
+    for module in MODULES:
+        best = min(import_time(module) for _ in range(repeat))
+        print("{:>16}: {:.1f}ms".format(module, best * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
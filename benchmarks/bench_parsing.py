@@ -0,0 +1,59 @@
+"""Benchmark the cells feed parsing backends.
+
+Run from the repository root:
+
+    $ python benchmarks/bench_parsing.py [cells]
+"""
+import sys
+import os
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from pgsheets import parsing  # noqa: E402
+
+
+def make_cells_feed(n_cells, n_cols=20):
+    url = 'https://spreadsheets.google.com/feeds/cells/KEY/od6/private/full'
+    entries = []
+    for i in range(n_cells):
+        row, col = i // n_cols + 1, i % n_cols + 1
+        entries.append(
+            "<entry><id>{url}/R{row}C{col}</id>"
+            "<title type='text'>R{row}C{col}</title>"
+            "<link rel='self' type='application/atom+xml'"
+            " href='{url}/R{row}C{col}'/>"
+            "<gs:cell row='{row}' col='{col}' inputValue='={row}*{col}'>"
+            "{value}</gs:cell></entry>"
+            .format(url=url, row=row, col=col, value=row * col))
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>"
+        "<feed xmlns='http://www.w3.org/2005/Atom'"
+        " xmlns:gs='http://schemas.google.com/spreadsheets/2006'>"
+        "<id>{url}</id>{entries}</feed>"
+        .format(url=url, entries="".join(entries))).encode()
+
+
+def main(n_cells=100000):
+    content = make_cells_feed(n_cells)
+    print("{} cells, {:.1f} MB".format(n_cells, len(content) / 1e6))
+    results = {}
+    for backend in parsing.BACKENDS:
+        results[backend] = list(parsing.parse_cells(content, backend))
+        best = min(timeit.repeat(
+            lambda: list(parsing.parse_cells(content, backend)),
+            number=1, repeat=3))
+        print("{:>8}: {:.3f}s ({:,.0f} cells/s)"
+              .format(backend, best, n_cells / best))
+    assert all(r == results['stdlib'] for r in results.values())
+
+    for processes in sorted({1, 2, os.cpu_count() or 1}):
+        best = min(timeit.repeat(
+            lambda: parsing.parse_cell_arrays(content, processes),
+            number=1, repeat=3))
+        print("{:>2} processes: {:.3f}s ({:,.0f} cells/s)"
+              .format(processes, best, n_cells / best))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
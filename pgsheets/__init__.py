@@ -3,10 +3,11 @@
 The Spreadsheet class represents a Google Spreadhsheet and can be used to
 access worksheets.
 
-The Client and Token objects are used for authentication with Google's API
+The Client and Token objects are used for authentication with Google's API,
+and a TokenPool spreads requests over several Tokens.
 """
 
-from pgsheets.token import Client, Token
+from pgsheets.token import Client, Token, TokenPool
 from pgsheets.models import Spreadsheet
 
 __version__ = '0.0.1'
@@ -0,0 +1,60 @@
+import importlib
+import importlib.util
+import threading
+
+# guards the first import of every lazily imported module
+_lock = threading.Lock()
+_modules = {}
+
+
+class _LazyModule():
+    """Stands in for a module, which is imported when one of its attributes
+    is first used. Attributes are read from and set on the real module.
+    """
+    __slots__ = ('_lazy_name', '_lazy_module')
+
+    def __init__(self, name):
+        object.__setattr__(self, '_lazy_name', name)
+        object.__setattr__(self, '_lazy_module', None)
+
+    def _load(self):
+        module = self._lazy_module
+        if module is None:
+            # the import runs to completion under the lock, so no thread
+            # sees a partly initialized module
+            with _lock:
+                module = self._lazy_module
+                if module is None:
+                    module = importlib.import_module(self._lazy_name)
+                    object.__setattr__(self, '_lazy_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __repr__(self):
+        return "<lazily imported module {!r}>".format(self._lazy_name)
+
+
+def lazy_import(name):
+    """Returns the module *name*, which is only imported when one of its
+    attributes is first used.
+
+    This keeps `import pgsheets` fast for code which never uses a
+    DataFrame or calls the Google API. The first use is safe from several
+    threads at once.
+    """
+    with _lock:
+        module = _modules.get(name)
+        if module is None:
+            if importlib.util.find_spec(name) is None:
+                raise ImportError("No module named {!r}".format(name),
+                                  name=name)
+            module = _modules[name] = _LazyModule(name)
+    return module
@@ -0,0 +1,264 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+
+from pgsheets._lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+class LRUCache():
+    """A thread safe, size bounded mapping whose entries expire.
+
+    The least recently used entry is discarded once more than *maxsize*
+    entries are stored. Entries older than *ttl* seconds are never returned.
+    """
+
+    def __init__(self, maxsize=10000, ttl=60.0, **kwargs):
+        super().__init__(**kwargs)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                stored, value = self._data[key]
+            except KeyError:
+                return default
+            if time.monotonic() - stored > self.ttl:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Coalescer():
+    """Shares the result of a call between threads making the same call at
+    the same time, so it is only made once.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, function):
+        """Returns function(), or the result of the call with the same *key*
+        in progress in another thread
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class _Utf8Strings():
+    """A sequence of strings stored as utf-8 text and the offsets of each
+    string in it. Strings are only decoded when the sequence is used.
+    """
+
+    def __init__(self, data, offsets, **kwargs):
+        super().__init__(**kwargs)
+        self._data = data
+        self._offsets = offsets
+        self._strings = None
+
+    def _decode(self):
+        if self._strings is None:
+            text = self._data.tobytes()
+            bounds = self._offsets.tolist()
+            self._strings = [text[start:stop].decode()
+                             for start, stop in zip(bounds, bounds[1:])]
+        return self._strings
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        return self._decode()[index]
+
+    def __iter__(self):
+        return iter(self._decode())
+
+    def __array__(self, dtype=None, copy=None):
+        strings = np.empty(len(self), dtype=object)
+        strings[:] = self._decode()
+        return strings
+
+
+def _encode_strings(strings):
+    """Returns the utf-8 text of *strings* and the offset of each in it"""
+    encoded = [(s or '').encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+class SnapshotCache():
+    """Stores the cells of whole worksheets on disk, so that other processes
+    can read a worksheet without retrieving it while it is unchanged.
+
+    The cache is disabled while *path* is None. By default it is the
+    directory in the PGSHEETS_SNAPSHOT_DIR environment variable.
+
+    A snapshot is kept for each worksheet, under
+    path/sheet key/worksheet id/version, where the version identifies the
+    worksheet's updated timestamp. The row and column numbers are int32
+    .npy files, and the inputValues and values are each a .npy file of
+    their utf-8 text and one of int64 offsets into it. Snapshots are memory
+    mapped when read. meta.json is written last, and a snapshot without it
+    is never read.
+    """
+
+    _FIELDS = ('input', 'value')
+
+    def __init__(self, path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _worksheetDir(self, sheet_key, worksheet_id):
+        return os.path.join(self.path, urllib.parse.quote(sheet_key, ''),
+                            urllib.parse.quote(worksheet_id, ''))
+
+    @staticmethod
+    def _version(updated):
+        return hashlib.sha1(updated.encode()).hexdigest()[:16]
+
+    def get(self, sheet_key, worksheet_id, updated):
+        """Returns the snapshot of a worksheet as parse_cell_arrays() pieces,
+        or None if there is none for the *updated* timestamp.
+
+        A snapshot which cannot be read, e.g. because it is corrupt, is
+        treated as missing.
+        """
+        path = os.path.join(self._worksheetDir(sheet_key, worksheet_id),
+                            self._version(updated))
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta['updated'] != updated:
+                return None
+
+            def load(name):
+                return np.load(os.path.join(path, name + '.npy'),
+                               mmap_mode='r')
+            rows, cols = load('rows'), load('cols')
+            strings = [_Utf8Strings(load(field), load(field + '_offsets'))
+                       for field in self._FIELDS]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if not (meta['cells'] == len(rows) == len(cols)
+                == len(strings[0]) == len(strings[1])):
+            return None
+        return [(rows, cols, *strings)]
+
+    def set(self, sheet_key, worksheet_id, updated, pieces):
+        """Stores parse_cell_arrays() *pieces* as the snapshot of a worksheet
+        at the *updated* timestamp, replacing any older snapshot.
+
+        Nothing is stored if the snapshot cannot be written, e.g. because
+        the directory is not writable or the disk is full.
+        """
+        try:
+            self._store(sheet_key, worksheet_id, updated, pieces)
+        except (OSError, ValueError):
+            pass
+
+    def _store(self, sheet_key, worksheet_id, updated, pieces):
+        parent = self._worksheetDir(sheet_key, worksheet_id)
+        version = self._version(updated)
+        os.makedirs(parent, exist_ok=True)
+
+        # written to a temporary directory then renamed, so a reader never
+        # sees a partial snapshot
+        tmp = os.path.join(parent, '.tmp-{}-{}'.format(
+            os.getpid(), threading.get_ident()))
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.mkdir(tmp)
+        try:
+            arrays = {
+                'rows': np.concatenate([np.zeros(0, dtype=np.intc)] + [
+                    np.frombuffer(p[0], dtype=np.intc) for p in pieces]),
+                'cols': np.concatenate([np.zeros(0, dtype=np.intc)] + [
+                    np.frombuffer(p[1], dtype=np.intc) for p in pieces]),
+                }
+            for i, field in enumerate(self._FIELDS, 2):
+                arrays[field], arrays[field + '_offsets'] = _encode_strings(
+                    [s for p in pieces for s in p[i]])
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, name + '.npy'), array)
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump({'updated': updated, 'cells': len(arrays['rows'])},
+                          f)
+            os.rename(tmp, os.path.join(parent, version))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            # another process may have stored the same snapshot first
+            if not os.path.exists(os.path.join(parent, version)):
+                raise
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        for name in os.listdir(parent):
+            if name != version and not name.startswith('.tmp-'):
+                shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+    def invalidate(self, sheet_key, worksheet_id):
+        shutil.rmtree(self._worksheetDir(sheet_key, worksheet_id),
+                      ignore_errors=True)
+
+    def clear(self):
+        for name in os.listdir(self.path):
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+
+# (cells feed uri, row, col) -> (inputValue, value) of cells read with
+# Worksheet.getCell() and Worksheet.getRange()
+cell_cache = LRUCache()
+
+# GET requests in progress, see pgsheets.models._get_shared()
+in_flight = Coalescer()
+
+# the cells of whole worksheets read with Worksheet.asDataFrame(), on disk
+snapshot_cache = SnapshotCache(os.environ.get('PGSHEETS_SNAPSHOT_DIR'))
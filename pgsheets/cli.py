@@ -0,0 +1,331 @@
+"""Command line tool for exporting and importing worksheets.
+
+    $ pgsheets export SPREADSHEET [--worksheet TITLE ...] [--range A1:C10]
+    $ pgsheets import SPREADSHEET FILE [FILE ...] [--worksheet TITLE ...]
+
+Credentials are read from the command line, the environment variables
+PGSHEETS_CLIENT_ID, PGSHEETS_CLIENT_SECRET and PGSHEETS_REFRESH_TOKEN, or a
+JSON file (--token-file or PGSHEETS_TOKEN_FILE) with the keys client_id,
+client_secret and refresh_token, in that order of precedence.
+
+Sheets are read and written a chunk of rows at a time, so memory use does
+not grow with the size of the sheet. Progress is reported on stderr.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from pgsheets._lazy import lazy_import
+from pgsheets.exceptions import PGSheetsException, PGSheetsValueError
+from pgsheets.models import Spreadsheet
+from pgsheets.token import Client, Token
+
+pd = lazy_import('pandas')
+
+_TOKEN_KEYS = ('client_id', 'client_secret', 'refresh_token')
+_FORMATS = ('csv', 'parquet')
+
+
+def parse_range(cell_range):
+    """Parses A1 notation, e.g. 'B2:D10', 'A:C' or '1:5', returning
+    (min_row, min_col, max_row, max_col). Missing bounds are None.
+    """
+    m = re.match(r'^([A-Z]*)(\d*):([A-Z]*)(\d*)$', cell_range.upper())
+    if not m or not any(m.groups()):
+        raise PGSheetsValueError("Bad range {!r}".format(cell_range))
+
+    def col(letters):
+        if not letters:
+            return None
+        n = 0
+        for c in letters:
+            n = n * 26 + ord(c) - ord('A') + 1
+        return n
+
+    min_col, min_row, max_col, max_row = m.groups()
+    return (int(min_row) if min_row else None, col(min_col),
+            int(max_row) if max_row else None, col(max_col))
+
+
+def get_token(client_id=None, client_secret=None, refresh_token=None,
+              token_file=None, environ=os.environ):
+    """Returns a Token from the arguments, the environment or a token file,
+    in that order of precedence
+    """
+    token_file = token_file or environ.get('PGSHEETS_TOKEN_FILE')
+    config = {}
+    if token_file:
+        with open(token_file) as f:
+            config = json.load(f)
+    given = dict(zip(_TOKEN_KEYS, (client_id, client_secret, refresh_token)))
+    values = {
+        key: (given[key] or environ.get('PGSHEETS_' + key.upper())
+              or config.get(key))
+        for key in _TOKEN_KEYS}
+    missing = [key for key, value in values.items() if not value]
+    if missing:
+        raise PGSheetsValueError(
+            "Missing credentials: {}".format(", ".join(missing)))
+    return Token(Client(values['client_id'], values['client_secret']),
+                 values['refresh_token'])
+
+
+class _Progress():
+    """Reports the progress of a transfer on stderr"""
+
+    def __init__(self, name, stream=None, **kwargs):
+        super().__init__(**kwargs)
+        self._name = name
+        self._stream = stream or sys.stderr
+        self._start = time.monotonic()
+        self.rows = 0
+        self.cells = 0
+
+    def update(self, rows, cells):
+        self.rows += rows
+        self.cells += cells
+        elapsed = max(time.monotonic() - self._start, 1e-9)
+        print("{}: {} rows, {} cells, {:.0f} cells/s".format(
+            self._name, self.rows, self.cells, self.cells / elapsed),
+            file=self._stream, flush=True)
+
+
+class _CSVWriter():
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        if path == '-':
+            self._file = sys.stdout
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class _ParquetWriter():
+    """Writes rows to a parquet file, using the first row as column names"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self._path = path
+        self._names = None
+        self._writer = None
+
+    def write(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if self._names is None and rows:
+            self._names, rows = rows[0], rows[1:]
+        if not rows:
+            return
+        table = pa.Table.from_arrays(
+            [pa.array([row[i] for row in rows], pa.string())
+             for i in range(len(self._names))],
+            names=self._names)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _writer(path, fmt):
+    if fmt == 'parquet':
+        return _ParquetWriter(path)
+    return _CSVWriter(path)
+
+
+def export_worksheet(worksheet, path, fmt='csv', cell_range=None,
+                     values=False, chunk_rows=1000, progress=None):
+    """Writes the worksheet (or the *cell_range* part of it, as returned by
+    parse_range()) to *path*, retrieving *chunk_rows* rows at a time.
+
+    Trailing empty rows are not written.
+    """
+    min_row, min_col, max_row, max_col = cell_range or (None,) * 4
+    min_row, min_col = min_row or 1, min_col or 1
+    max_row = max_row or worksheet._loadInfo('rows')
+    max_col = max_col or worksheet._loadInfo('cols')
+    width = max_col - min_col + 1
+
+    writer = _writer(path, fmt)
+    blank = 0
+    try:
+        for start in range(min_row, max_row + 1, chunk_rows):
+            end = min(start + chunk_rows - 1, max_row)
+            grid = [[''] * width for _ in range(end - start + 1)]
+            for row, col, input_value, value in worksheet._getCells({
+                    'min-row': start, 'max-row': end,
+                    'min-col': min_col, 'max-col': max_col}):
+                grid[row - start][col - min_col] = (
+                    value if values else input_value)
+
+            # empty rows are only written once a later row has content
+            rows = []
+            for row in grid:
+                if any(row):
+                    rows.extend([''] * width for _ in range(blank))
+                    rows.append(row)
+                    blank = 0
+                else:
+                    blank += 1
+            writer.write(rows)
+            if progress is not None:
+                progress.update(len(grid), len(grid) * width)
+    finally:
+        writer.close()
+
+
+def _read_chunks(path, fmt, chunk_rows):
+    """Yields DataFrames of at most *chunk_rows* rows from a file"""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(
+            sys.stdin if path == '-' else path, header=None, dtype=str,
+            keep_default_na=False, chunksize=chunk_rows)
+
+
+def import_worksheet(worksheet, path, fmt='csv', row=1, col=1,
+                     chunk_rows=1000, progress=None):
+    """Writes the contents of the file at *path* to the worksheet with its
+    top left at row, col, reading *chunk_rows* rows at a time.
+    """
+    def chunks():
+        for chunk in _read_chunks(path, fmt, chunk_rows):
+            yield chunk
+            if progress is not None:
+                progress.update(len(chunk), chunk.size)
+
+    worksheet.setDataFrames(chunks(), x_pos=col, y_pos=row, copy_index=False,
+                            copy_columns=fmt == 'parquet')
+
+
+def _format(path, fmt):
+    if fmt is not None:
+        return fmt
+    return 'parquet' if path.endswith(('.parquet', '.pq')) else 'csv'
+
+
+def _run(jobs, n_jobs):
+    """Runs callables, *n_jobs* at a time, raising the first error"""
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for future in [executor.submit(job) for job in jobs]:
+            future.result()
+
+
+def _export(args, spreadsheet):
+    worksheets = spreadsheet.getWorksheets()
+    if args.worksheet:
+        titles = {w._info.title: w for w in worksheets}
+        missing = [t for t in args.worksheet if t not in titles]
+        if missing:
+            raise PGSheetsValueError(
+                "unavailable sheets {}".format(", ".join(missing)))
+        worksheets = [titles[t] for t in args.worksheet]
+    cell_range = parse_range(args.range) if args.range else None
+
+    jobs = []
+    for worksheet in worksheets:
+        title = worksheet._info.title
+        fmt = args.format or 'csv'
+        if len(worksheets) == 1 and args.output:
+            path = args.output
+            fmt = _format(path, args.format)
+        else:
+            path = os.path.join(args.output or '.', '{}.{}'.format(title, fmt))
+        jobs.append(lambda w=worksheet, path=path, fmt=fmt: export_worksheet(
+            w, path, fmt, cell_range, args.values, args.chunk_rows,
+            _Progress(w._info.title)))
+    _run(jobs, args.jobs)
+
+
+def _import(args, spreadsheet):
+    titles = args.worksheet or [
+        os.path.splitext(os.path.basename(f))[0] for f in args.files]
+    if len(titles) != len(args.files):
+        raise PGSheetsValueError(
+            "--worksheet must be given once for each file")
+    existing = {w._info.title: w for w in spreadsheet.getWorksheets()}
+    row, col = parse_range(args.at + ':')[:2] if args.at else (1, 1)
+
+    jobs = []
+    for path, title in zip(args.files, titles):
+        worksheet = existing.get(title) or spreadsheet.addWorksheet(title)
+        jobs.append(lambda w=worksheet, path=path, title=title:
+                    import_worksheet(
+                        w, path, _format(path, args.format), row or 1,
+                        col or 1, args.chunk_rows, _Progress(title)))
+    _run(jobs, args.jobs)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='pgsheets', description="Export and import Google Sheets")
+    parser.add_argument('--client-id')
+    parser.add_argument('--client-secret')
+    parser.add_argument('--refresh-token')
+    parser.add_argument('--token-file')
+    parser.add_argument('--jobs', '-j', type=int, default=4,
+                        help="worksheets transferred in parallel")
+    parser.add_argument('--chunk-rows', type=int, default=1000,
+                        help="rows transferred per request")
+    parser.add_argument('--format', choices=_FORMATS,
+                        help="by default from the file extension, else csv")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    export = commands.add_parser('export', help="write worksheets to files")
+    export.add_argument('spreadsheet', help="spreadsheet key or URL")
+    export.add_argument('--worksheet', '-w', action='append',
+                        help="title of a worksheet, by default all")
+    export.add_argument('--output', '-o',
+                        help="file (or - for stdout) for a single worksheet,"
+                             " otherwise a directory")
+    export.add_argument('--range', '-r', help="cells to export, e.g. A1:C10")
+    export.add_argument('--values', action='store_true',
+                        help="export values rather than formulas")
+
+    import_ = commands.add_parser('import', help="write files to worksheets")
+    import_.add_argument('spreadsheet', help="spreadsheet key or URL")
+    import_.add_argument('files', nargs='+', help="files, or - for stdin")
+    import_.add_argument('--worksheet', '-w', action='append',
+                         help="title of the worksheet for each file, by"
+                              " default the file name; created if missing")
+    import_.add_argument('--at', help="top left cell, e.g. B2")
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    try:
+        token = get_token(args.client_id, args.client_secret,
+                          args.refresh_token, args.token_file)
+        spreadsheet = Spreadsheet(token, args.spreadsheet, lazy=True)
+        if args.command == 'export':
+            _export(args, spreadsheet)
+        else:
+            _import(args, spreadsheet)
+    except (PGSheetsException, OSError) as e:
+        print("pgsheets: error: {}".format(e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
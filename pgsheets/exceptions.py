@@ -10,6 +10,17 @@ class PGSheetsValueError(PGSheetsException):
     pass
 
 
+class PGSheetsBatchException(PGSheetsHTTPException):
+    """Raised when some cells of a batch update could not be written.
+
+    The BatchResult of the update is available as the *result* attribute.
+    """
+
+    def __init__(self, message, result):
+        super().__init__(message)
+        self.result = result
+
+
 def _check_status(r):
     if r.status_code // 100 != 2:
         raise PGSheetsHTTPException(
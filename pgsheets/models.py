@@ -1,12 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, SubElement
-import urllib
+import copy
+import urllib.parse
 import re
+import time
 
-import requests
-import pandas as pd
+from pgsheets._lazy import lazy_import
+from pgsheets.exceptions import _check_status, PGSheetsValueError, \
+    PGSheetsHTTPException, PGSheetsBatchException
+from pgsheets.writer import CellWriter
+from pgsheets.watch import Watcher
+from pgsheets.cache import cell_cache, in_flight, snapshot_cache
+from pgsheets.parsing import parse_cells, parse_cell_arrays, \
+    parse_batch_statuses
 
-from pgsheets.exceptions import _check_status, PGSheetsValueError
+# these are only imported once used, see pgsheets._lazy
+requests = lazy_import('requests')
+pd = lazy_import('pandas')
 
 
 def _ns_w3(name):
@@ -24,29 +35,399 @@ def _get_first(elements, prop, equal):
     raise ValueError('missing element')
 
 
+def _request(token, method, url, headers=None, **kwargs):
+    """Calls the Google API with the authorization of *token*, raising a
+    PGSheetsHTTPException for a bad response.
+
+    A token which tracks its requests (e.g. a TokenPool) is told of each
+    response, and may ask for a throttled request to be made again.
+    """
+    release = getattr(token, 'release', None)
+    while True:
+        auth_headers = token.getAuthorizationHeader(dict(headers or {}))
+        status_code = None
+        try:
+            r = getattr(requests, method)(url, headers=auth_headers, **kwargs)
+            status_code = r.status_code
+        finally:
+            retry = release is not None and release(auth_headers, status_code)
+        if not retry:
+            break
+    _check_status(r)
+    return r
+
+
+def _get_shared(token, url, kind, parse, params=None):
+    """GETs *url* and returns the response content parsed by *parse*.
+
+    Identical calls (the same token, url, params and *kind* of parse) made
+    at the same time by other threads share the request and the result.
+    """
+    key = (id(token), url, tuple(sorted((params or {}).items())), kind)
+    return in_flight.call(key, lambda: parse(
+        _request(token, 'get', url, params=params).content))
+
+
+# approximate sizes, in bytes, used to estimate costs: a worksheet entry,
+# a cell's entry in a cells feed or batch response, and the fixed parts of a
+# batch request and of each of its entries
+_ENTRY_BYTES = 2500
+_CELL_ENTRY_BYTES = 500
+_BATCH_BYTES = 200
+_BATCH_ENTRY_BYTES = 175
+
+# the most requests made at once for the columns of asDataFrame(columns=...)
+_MAX_COLUMN_REQUESTS = 8
+
+# the maximum number of cells in a sheet (as of July 2015)
+_MAX_CELLS = 2000000
+
+_FEEDS_URL = 'https://spreadsheets.google.com/feeds'
+_CELLS_REL = 'http://schemas.google.com/spreadsheets/2006#cellsfeed'
+_WORKSHEETS_REL = (
+    'http://schemas.google.com/spreadsheets/2006#worksheetsfeed')
+
+
+def _links(element):
+    """Returns a dictionary of rel -> href for the links of an entry"""
+    return {link.get('rel'): link.get('href')
+            for link in element.findall(_ns_w3('link'))}
+
+
+def _cells_frame(pieces, values=False, columns=None):
+    """Returns a DataFrame of cells parsed by parse_cell_arrays(), indexed by
+    row and column number with NaN for empty cells.
+
+    If *columns* is a list of column numbers exactly those columns are
+    included, in that order. Cells of other columns in the pieces only
+    extend the rows of the frame.
+    """
+    import numpy as np
+    # view the int arrays in place, rather than copying them
+    pieces = [(np.frombuffer(rows, dtype=np.intc),
+               np.frombuffer(cols, dtype=np.intc),
+               values_ if values else input_values)
+              for rows, cols, input_values, values_ in pieces if len(rows)]
+    if columns is None:
+        if not pieces:
+            return pd.DataFrame()
+        n_rows = max(int(rows.max()) for rows, _, _ in pieces)
+        n_cols = max(int(cols.max()) for _, cols, _ in pieces)
+        labels = pd.RangeIndex(1, n_cols + 1)
+    else:
+        n_rows = max([0] + [int(rows.max()) for rows, _, _ in pieces])
+        if pieces:
+            # the position of each column number in the result, 0 for the
+            # columns which are not included
+            position = np.zeros(
+                max(columns + [int(cols.max()) for _, cols, _ in pieces]) + 1,
+                dtype=np.intp)
+            position[columns] = np.arange(1, len(columns) + 1)
+            mapped = []
+            for rows, cols, contents in pieces:
+                cols = position[cols]
+                keep = cols > 0
+                if not keep.all():
+                    rows, cols = rows[keep], cols[keep]
+                    contents = np.asarray(contents, dtype=object)[keep]
+                mapped.append((rows, cols, contents))
+            pieces = mapped
+        n_cols = len(columns)
+        labels = pd.Index(columns)
+
+    grid = np.full((n_rows, n_cols), np.nan, dtype=object)
+    for rows, cols, contents in pieces:
+        grid[rows - 1, cols - 1] = contents
+    return pd.DataFrame(
+        grid,
+        index=pd.RangeIndex(1, n_rows + 1),
+        columns=labels,
+        ).infer_objects()
+
+
+def _shape_frame(df, set_index=True, set_columns=True):
+    """Uses the first row and column of a DataFrame from _cells_frame() as
+    its column names and index, see Worksheet.asDataFrame()
+    """
+    if len(df):
+        if set_columns:
+            df.columns = df.iloc[0]
+            df = df.drop(1)
+        if set_index and len(df):
+            df.index = df[df.columns[0]]
+            del df[df.columns[0]]
+            if not set_columns:
+                df.index.name = ""
+
+        # we use the index name, not the columns name
+        df.columns.name = ""
+
+    return df
+
+
+def _column_runs(numbers):
+    """Returns (first, last) for each run of consecutive numbers"""
+    runs = []
+    for n in sorted(set(numbers)):
+        if runs and runs[-1][1] == n - 1:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [tuple(run) for run in runs]
+
+
+def _frame_size(df, x_pos=1, y_pos=1, copy_index=True, copy_columns=True):
+    """Returns the (rows, cols) a sheet needs to hold *df* placed at
+    x_pos, y_pos, see Worksheet.setDataFrame()
+    """
+    y, x = df.shape
+    return (y + y_pos - 1 + int(copy_columns is True),
+            x + x_pos - 1 + int(copy_index is True))
+
+
+def _frame_cells(df, x_pos=1, y_pos=1, copy_index=True, copy_columns=True,
+                 escape_formulae=False):
+    """Yields the (row, col, content) cells representing *df* placed at
+    x_pos, y_pos, see Worksheet.setDataFrame()
+    """
+    # x_pos, y_post is the position of the data, excluding any columns
+    if copy_index is True:
+        x_pos += 1
+    if copy_columns is True:
+        y_pos += 1
+
+    def str_repr(data):
+        """Get a representation of 'data' for a cell"""
+        if pd.isnull(data):
+            return ""
+        data = str(data)
+        if escape_formulae and data and data[0] == "=":
+            data = "'{}".format(data)
+        return str(data)
+
+    if copy_columns:
+        for i, col in enumerate(df.columns):
+            yield (y_pos - 1, x_pos+i, str_repr(col))
+    if copy_index:
+        for i, col in enumerate(df.index):
+            yield (i+y_pos, x_pos-1, str_repr(col))
+    if copy_columns and copy_index:
+        yield (y_pos-1, x_pos-1, str_repr(df.index.name))
+
+    for i, row in enumerate(df.values):
+        for j, v in enumerate(row):
+            yield (i+y_pos, j+x_pos, str_repr(v))
+
+
+class _WorksheetInfo():
+    """The parsed metadata of a worksheet entry.
+
+    Attributes which have not been retrieved from the API are None.
+    """
+    __slots__ = ('sheet_key', 'worksheet_id', 'title', 'updated',
+                 'self_uri', 'edit_uri', 'cells_uri', 'rows', 'cols')
+
+    def __init__(self, sheet_key, worksheet_id, title=None, updated=None,
+                 self_uri=None, edit_uri=None, cells_uri=None, rows=None,
+                 cols=None):
+        quoted = (urllib.parse.quote(sheet_key),
+                  urllib.parse.quote(worksheet_id))
+        self.sheet_key = sheet_key
+        self.worksheet_id = worksheet_id
+        self.title = title
+        self.updated = updated
+        self.self_uri = self_uri or (
+            '{}/worksheets/{}/private/full/{}'.format(_FEEDS_URL, *quoted))
+        self.edit_uri = edit_uri
+        self.cells_uri = cells_uri or (
+            '{}/cells/{}/{}/private/full'.format(_FEEDS_URL, *quoted))
+        self.rows = rows
+        self.cols = cols
+
+    @classmethod
+    def fromElement(cls, element):
+        id_parts = element.find(_ns_w3('id')).text.split('/')
+        links = _links(element)
+        updated = element.find(_ns_w3('updated'))
+        return cls(
+            sheet_key=id_parts[-4],
+            worksheet_id=id_parts[-1],
+            title=element.find(_ns_w3('title')).text,
+            updated=None if updated is None else updated.text,
+            self_uri=links.get('self'),
+            edit_uri=links.get('edit'),
+            cells_uri=links.get(_CELLS_REL),
+            rows=int(element.find(_ns_sheet('rowCount')).text),
+            cols=int(element.find(_ns_sheet('colCount')).text),
+            )
+
+
+class _SpreadsheetInfo():
+    """The parsed metadata of a spreadsheet entry.
+
+    Attributes which have not been retrieved from the API are None.
+    """
+    __slots__ = ('key', 'title', 'url', 'worksheets_uri')
+
+    def __init__(self, key, title=None, url=None, worksheets_uri=None):
+        self.key = key
+        self.title = title
+        self.url = url
+        self.worksheets_uri = worksheets_uri or (
+            '{}/worksheets/{}/private/full'
+            .format(_FEEDS_URL, urllib.parse.quote(key)))
+
+    @classmethod
+    def fromElement(cls, element):
+        links = _links(element)
+        return cls(
+            key=element.find(_ns_w3('id')).text.split('/')[-1],
+            title=element.find(_ns_w3('title')).text,
+            url=links.get('alternate'),
+            worksheets_uri=links.get(_WORKSHEETS_REL),
+            )
+
+
+class CostEstimate():
+    """An estimate of the API calls an operation makes, returned by methods
+    called with dry_run=True. Estimates can be added together.
+
+    * requests
+        The number of HTTP requests
+    * cells
+        The number of cells written, or at most read
+    * bytes_sent, bytes_received
+        The approximate size of the requests and responses
+    * batches
+        The number of cells in each batch update
+    * resizes
+        The (rows, cols) of each resize, None where the size is unknown
+    * exceeds_limit
+        Whether a resize would exceed the maximum size of a sheet
+    """
+    __slots__ = ('requests', 'cells', 'bytes_sent', 'bytes_received',
+                 'batches', 'resizes', 'exceeds_limit')
+
+    def __init__(self):
+        self.requests = 0
+        self.cells = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.batches = []
+        self.resizes = []
+        self.exceeds_limit = False
+
+    def __add__(self, other):
+        total = CostEstimate()
+        for attr in self.__slots__:
+            value = getattr(self, attr)
+            if isinstance(value, bool):
+                value = value or getattr(other, attr)
+            else:
+                value = value + getattr(other, attr)
+            setattr(total, attr, value)
+        return total
+
+    def __repr__(self):
+        return ("<{cls} requests={requests} cells={cells} "
+                "bytes_sent={bytes_sent} bytes_received={bytes_received} "
+                "resizes={resizes} exceeds_limit={exceeds_limit}>".format(
+                    cls=self.__class__.__name__,
+                    **{attr: getattr(self, attr) for attr in self.__slots__}))
+
+
+class BatchResult():
+    """The outcome of a batch update of cells.
+
+    * cells
+        The number of cells to update
+    * updated
+        The number of cells successfully updated
+    * failed
+        (row, col, content, code, reason) of the cells which could not be
+        updated, after all retries
+    * timings
+        The seconds taken by each request, the first being for all cells and
+        any others for the retried cells
+    """
+    __slots__ = ('cells', 'updated', 'failed', 'timings')
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.updated = 0
+        self.failed = []
+        self.timings = []
+
+    @property
+    def requests(self):
+        return len(self.timings)
+
+    @property
+    def elapsed(self):
+        return sum(self.timings)
+
+    def __repr__(self):
+        return ("<{cls} cells={cells} updated={updated} failed={failed} "
+                "requests={requests} elapsed={elapsed:.3f}>".format(
+                    cls=self.__class__.__name__, cells=self.cells,
+                    updated=self.updated, failed=len(self.failed),
+                    requests=self.requests, elapsed=self.elapsed))
+
+
 class Worksheet():
     """Represents a single Spreadsheet's worksheet.
 
-    Do not initialize manually, instead retrieve from a Spreadsheet object.
+    Retrieve from a Spreadsheet object, or initialize with the *key* of
+    the spreadsheet and the *worksheet_id* of the worksheet. In the latter
+    case no API call is made until the worksheet's metadata is needed.
     """
 
-    def __init__(self, token, element, **kwargs):
-        self._element = element
+    # seconds to wait before the first retry of cells which failed to update
+    _BATCH_RETRY_DELAY = 0.5
+
+    def __init__(self, token, element=None, key=None, worksheet_id=None,
+                 **kwargs):
         self._token = token
+        if element is not None:
+            self._setEntry(element)
+        elif key is not None and worksheet_id is not None:
+            self._entry = None
+            self._info = _WorksheetInfo(key, worksheet_id)
+        else:
+            raise PGSheetsValueError(
+                "Either an element or a key and worksheet_id are required")
         super().__init__(**kwargs)
 
+    def _setEntry(self, element):
+        self._entry = element
+        self._info = _WorksheetInfo.fromElement(element)
+
+    @property
+    def _element(self):
+        """The worksheet entry, retrieved from the API if not yet known"""
+        if self._entry is None:
+            self._getFeed()
+        return self._entry
+
+    def _loadInfo(self, attr):
+        """Returns a metadata attribute, calling the API if it is unknown"""
+        value = getattr(self._info, attr)
+        if value is None:
+            self._getFeed()
+            value = getattr(self._info, attr)
+        return value
+
     def _getFeed(self):
-        self_uri = _get_first(
-            self._element.findall(_ns_w3('link')), 'rel', 'self').get('href')
-        r = requests.get(self_uri,
-                         headers=self._token.getAuthorizationHeader())
-        _check_status(r)
-        self._element = ElementTree.fromstring(r.content.decode())
-        return self._element
+        self._setEntry(_get_shared(
+            self._token, self._info.self_uri, 'entry',
+            lambda content: ElementTree.fromstring(content.decode())))
+        return self._entry
 
     def _resize(self, feed, rows=None, cols=None):
         if cols is None and rows is None:
             return
+        # the known entry is left untouched should the update fail
+        feed = copy.deepcopy(feed)
         edit_uri = _get_first(
             feed.findall(_ns_w3('link')), 'rel', 'edit').get('href')
 
@@ -57,17 +438,32 @@ class Worksheet():
 
         if (int(feed.find(_ns_sheet('colCount')).text)
                 * int(feed.find(_ns_sheet('rowCount')).text)
-                > 2000000):
+                > _MAX_CELLS):
             raise PGSheetsValueError(
-                "No sheet may be more than 2000000 cells large"
+                "No sheet may be more than {} cells large".format(_MAX_CELLS)
                 )
 
-        r = requests.put(
+        r = _request(
+            self._token, 'put',
             edit_uri,
             data=ElementTree.tostring(feed),
-            headers=self._token.getAuthorizationHeader(
-                {'content-type': 'application/atom+xml'}))
-        _check_status(r)
+            headers={'content-type': 'application/atom+xml'})
+        # the response is the updated entry, including its new edit link
+        self._setEntry(ElementTree.fromstring(r.content.decode()))
+
+    def _resizeKnown(self, rows=None, cols=None):
+        """Resizes using the last known entry, only retrieving it again if
+        it is unknown or the update is rejected (e.g. the entry is stale)
+        """
+        if cols is None and rows is None:
+            return
+        if self._entry is not None:
+            try:
+                self._resize(self._entry, rows, cols)
+                return
+            except PGSheetsHTTPException:
+                pass
+        self._resize(self._getFeed(), rows, cols)
 
     def _getTitle(self, feed):
         """Calling with feed=self._element will get the title at the
@@ -85,40 +481,245 @@ class Worksheet():
         return self._getTitle(self._getFeed())
 
     def _getSheetKey(self):
-        return self._element.find(_ns_w3('id')).text.split('/')[-4]
+        return self._info.sheet_key
+
+    def getWorksheetId(self):
+        """Get the id of this worksheet within its spreadsheet.
 
-    def resizeToAtLeast(self, rows=None, cols=None):
+        Together with the spreadsheet key this is enough to initialize a
+        Worksheet without calling the Google API.
+        """
+        return self._info.worksheet_id
+
+    def _estimateResize(self, estimate, rows=None, cols=None, exact=False):
+        """Adds the requests made by resize() (or resizeToAtLeast() if not
+        *exact*) to *estimate*, using the last known size
+        """
+        if rows is None and cols is None:
+            return estimate
+        known_rows, known_cols = self._info.rows, self._info.cols
+        if known_rows is None:
+            # the entry is retrieved, and we assume a resize is needed
+            estimate.requests += 1
+            estimate.bytes_received += _ENTRY_BYTES
+            estimate.resizes.append((rows, cols))
+        else:
+            def changed(new, known):
+                if new is None or (not exact and new <= known):
+                    return None
+                return new
+            rows, cols = changed(rows, known_rows), changed(cols, known_cols)
+            if rows is None and cols is None:
+                return estimate
+            rows = known_rows if rows is None else rows
+            cols = known_cols if cols is None else cols
+            estimate.resizes.append((rows, cols))
+        if rows is not None and cols is not None and rows * cols > _MAX_CELLS:
+            estimate.exceeds_limit = True
+        estimate.requests += 1
+        estimate.bytes_sent += _ENTRY_BYTES
+        estimate.bytes_received += _ENTRY_BYTES
+        return estimate
+
+    def resizeToAtLeast(self, rows=None, cols=None, dry_run=False):
         """Ensures a minimum size of the sheet.
 
         Setting row=None or cols=None ignores that axis.
+
+        With dry_run=True nothing is changed, instead a CostEstimate is
+        returned.
         """
+        if dry_run:
+            return self._estimateResize(CostEstimate(), rows, cols)
         if rows is None and cols is None:
             return
-        # get the current size
-        feed = self._getFeed()
-
-        f_cols, f_rows = (
-            int(feed.find(_ns_sheet('colCount')).text),
-            int(feed.find(_ns_sheet('rowCount')).text),
-            )
+        # the last known size is used, so no API call is made when the
+        # sheet is already big enough
+        f_rows, f_cols = self._loadInfo('rows'), self._loadInfo('cols')
         if rows is None or rows <= f_rows:
             rows = None
         if cols is None or cols <= f_cols:
             cols = None
-        self._resize(feed, rows, cols)
+        self._resizeKnown(rows, cols)
 
-    def resize(self, rows=None, cols=None):
+    def resize(self, rows=None, cols=None, dry_run=False):
         """Resizes one or both of the sheet's axes.
 
         Setting row=None or cols=None ignores that axis.
         Data outside of the new dimensions will be deleted.
+
+        With dry_run=True nothing is changed, instead a CostEstimate is
+        returned.
         """
-        if rows is None and cols is None:
-            return
-        feed = self._getFeed()
-        self._resize(feed, rows, cols)
+        if dry_run:
+            return self._estimateResize(CostEstimate(), rows, cols,
+                                        exact=True)
+        # always sent, as the sheet may have grown since it was last seen
+        self._resizeKnown(rows, cols)
+
+    def _getCells(self, params=None):
+        """Returns an iterator of (row, col, inputValue, value) tuples from
+        the cells feed, optionally restricted by query *params*
+        """
+        r = _request(self._token, 'get', self._info.cells_uri, params=params)
+        return parse_cells(r.content)
 
-    def asDataFrame(self, set_index=True, set_columns=True, values=False):
+    def getCell(self, row, col, values=False):
+        """Returns the content of a single cell, counting from 1.
+
+        Setting values=True returns the value of the cell, rather than a
+        formula.
+
+        Recently read cells are served from pgsheets.cache.cell_cache,
+        otherwise this involves calling the Google API.
+        """
+        return self.getRange(row, col, row, col, values=values)[0][0]
+
+    def getRange(self, min_row, min_col, max_row, max_col, values=False):
+        """Returns the content of a block of cells as a list of rows, each a
+        list of strings. The bounds are inclusive and count from 1.
+
+        Setting values=True returns the values of the cells, rather than
+        formulas.
+
+        Recently read cells are served from pgsheets.cache.cell_cache,
+        otherwise this involves calling the Google API.
+        """
+        uri = self._info.cells_uri
+        keys = [[(uri, row, col) for col in range(min_col, max_col + 1)]
+                for row in range(min_row, max_row + 1)]
+        cells = [[cell_cache.get(key) for key in row] for row in keys]
+
+        if any(cell is None for row in cells for cell in row):
+            found = {(row, col): (input_value, value)
+                     for row, col, input_value, value in self._getCells({
+                         'min-row': min_row, 'max-row': max_row,
+                         'min-col': min_col, 'max-col': max_col,
+                         'return-empty': 'true',
+                         })}
+            cells = []
+            for row in keys:
+                cells.append([])
+                for key in row:
+                    cell = found.get(key[1:], ("", ""))
+                    cell_cache.set(key, cell)
+                    cells[-1].append(cell)
+
+        return [[cell[1] if values else cell[0] for cell in row]
+                for row in cells]
+
+    def _columnNumbers(self, columns, values=False):
+        """Returns the column number of each of *columns*, which are either
+        column numbers or names in the first row
+        """
+        names = [c for c in columns if not isinstance(c, int)]
+        header = {}
+        if names:
+            for row, col, input_value, value in self._getCells(
+                    {'min-row': 1, 'max-row': 1}):
+                header.setdefault(value if values else input_value, col)
+            missing = [n for n in names if n not in header]
+            if missing:
+                raise PGSheetsValueError(
+                    "unavailable columns {}".format(missing))
+        return [c if isinstance(c, int) else header[c] for c in columns]
+
+    def _getColumnCells(self, numbers, processes=None):
+        """Retrieves the cells of the given column numbers, requesting each
+        run of adjacent columns in parallel, and returns parse_cell_arrays()
+        pieces
+        """
+        runs = _column_runs(numbers)
+        if not runs:
+            return []
+
+        def get(run):
+            return _get_shared(
+                self._token, self._info.cells_uri, 'cells',
+                lambda content: parse_cell_arrays(content, processes),
+                params={'min-col': run[0], 'max-col': run[1]})
+
+        with ThreadPoolExecutor(
+                max_workers=min(len(runs), _MAX_COLUMN_REQUESTS)) as pool:
+            return [piece for pieces in pool.map(get, runs)
+                    for piece in pieces]
+
+    def _getSnapshotPieces(self, processes=None):
+        """Returns the pieces of the whole sheet from
+        pgsheets.cache.snapshot_cache, retrieving and storing them if the
+        snapshot is not of the worksheet's current updated timestamp
+        """
+        # the entry is retrieved before the cells, so cells changed in
+        # between are stored as older than they are and read again later
+        self._getFeed()
+        info = self._info
+        if info.updated is not None:
+            pieces = snapshot_cache.get(info.sheet_key, info.worksheet_id,
+                                        info.updated)
+            if pieces is not None:
+                return pieces
+        pieces = _get_shared(
+            self._token, info.cells_uri, 'cells',
+            lambda content: parse_cell_arrays(content, processes))
+        if info.updated is not None:
+            snapshot_cache.set(info.sheet_key, info.worksheet_id,
+                               info.updated, pieces)
+        return pieces
+
+    def _getFramePieces(self, set_index=True, values=False, processes=None,
+                        columns=None):
+        """Retrieves the cells for asDataFrame(), returning the parsed pieces
+        and the column numbers of the result (None for all columns)
+        """
+        if columns is None:
+            if snapshot_cache.path is not None:
+                return self._getSnapshotPieces(processes), None
+            pieces = _get_shared(
+                self._token, self._info.cells_uri, 'cells',
+                lambda content: parse_cell_arrays(content, processes))
+            return pieces, None
+        numbers = self._columnNumbers(columns, values)
+        if set_index:
+            numbers = [1] + [n for n in numbers if n != 1]
+        numbers = list(dict.fromkeys(numbers))
+        # the first column is always retrieved, as it gives the rows of the
+        # frame where the requested columns end early
+        return self._getColumnCells([1] + numbers, processes), numbers
+
+    def _estimateRead(self, columns=None):
+        """Returns a CostEstimate of asDataFrame(), using the last known size
+        of the sheet (none if it is unknown). The number of cells is an upper
+        bound, as empty cells are not retrieved.
+        """
+        estimate = CostEstimate()
+        info = self._info
+        rows, cols = info.rows or 0, info.cols or 0
+        if columns is None:
+            if snapshot_cache.path is not None:
+                # the entry is always retrieved, and the cells only if there
+                # is no snapshot, assuming the sheet has not changed since
+                estimate.requests += 1
+                estimate.bytes_received += _ENTRY_BYTES
+                if info.updated is not None and snapshot_cache.get(
+                        info.sheet_key, info.worksheet_id,
+                        info.updated) is not None:
+                    return estimate
+            estimate.requests += 1
+        else:
+            numbers = [c for c in columns if isinstance(c, int)]
+            names = len(columns) - len(numbers)
+            # the first column is always retrieved, and names are looked up
+            # in the header and assumed not adjacent
+            numbers = [1] + numbers
+            estimate.requests += (len(_column_runs(numbers)) + names
+                                  + int(names > 0))
+            cols = min(cols, len(set(numbers)) + names)
+        estimate.cells = rows * cols
+        estimate.bytes_received += estimate.cells * _CELL_ENTRY_BYTES
+        return estimate
+
+    def asDataFrame(self, set_index=True, set_columns=True, values=False,
+                    processes=None, columns=None, dry_run=False):
         """Returns a DataFrame representation of the sheet
 
         The index/column names are the row/column numbers, unless set_index or
@@ -127,48 +728,42 @@ class Worksheet():
         Setting values=True returns the values of the cell, reather than a
         formula.
 
-        Currently all values are returned as a string.
-        """
-        cell_feed_uri = (
-            _get_first(self._element.findall(_ns_w3('link')), 'rel',
-                       'http://schemas.google.com/spreadsheets/2006#cellsfeed')
-            .get('href')
-            )
-        r = requests.get(
-            cell_feed_uri, headers=self._token.getAuthorizationHeader())
-        _check_status(r)
-        cell_feed = ElementTree.fromstring(r.content.decode())
-
-        df = pd.DataFrame()
-        for cell in cell_feed.findall(_ns_w3('entry')):
-            gs = cell.find(_ns_sheet('cell'))
-            if values:
-                content = list(gs.itertext())[0]
-            else:
-                content = gs.get('inputValue')
-            column = int(gs.get('col'))
-            row = int(gs.get('row'))
-
-            df.loc[row, column] = content
-
-        # fill in blanks and order
-        if len(df):
-            df = df.reindex(columns=list(range(1, max(df.columns)+1)))
-            df = df.reindex(list(range(1, max(df.index)+1)))
+        For very large sheets, setting processes to a number greater than 1
+        parses the cells in that many processes.
 
-            if set_columns:
-                df.columns = df.iloc[0]
-                df = df.drop(1)
-            if set_index and len(df):
-                df.index = df[df.columns[0]]
-                del df[df.columns[0]]
-                if not set_columns:
-                    df.index.name = ""
+        Setting columns to a list of column names (as in the first row) or
+        column numbers (counting from 1) only retrieves those columns, and
+        returns them in that order. With set_index the first column is
+        retrieved as the index. The first column is always retrieved, and
+        the rows extend to its last cell or that of any requested column.
 
-            # we use the index name, not the columns name
-            df.columns.name = ""
+        With dry_run=True nothing is retrieved, instead a CostEstimate is
+        returned.
 
-        return df
+        Currently all values are returned as a string.
+        """
+        if dry_run:
+            return self._estimateRead(columns)
+        pieces, numbers = self._getFramePieces(set_index, values, processes,
+                                               columns)
+        return _shape_frame(
+            _cells_frame(pieces, values, numbers),
+            set_index, set_columns)
+
+    def asDataFrames(self, set_index=True, set_columns=True, processes=None,
+                     columns=None):
+        """Returns a tuple of two DataFrame representations of the sheet, the
+        first of formulas and the second of values.
+
+        This is equivalent to calling asDataFrame() with values=False and
+        values=True, but retrieves and parses the sheet only once.
+        Column names in *columns* are matched against the formulas.
+        """
+        pieces, numbers = self._getFramePieces(set_index, False, processes,
+                                               columns)
+        return tuple(_shape_frame(_cells_frame(pieces, values, numbers),
+                                  set_index, set_columns)
+                     for values in (False, True))
 
     def setDataFrame(self,
                      df,
@@ -178,6 +773,7 @@ class Worksheet():
                      copy_columns=True,
                      resize=False,
                      escape_formulae=False,
+                     dry_run=False,
                      ):
         """Sets the values of a given DataFrame at x_pos, y_pos
 
@@ -191,6 +787,8 @@ class Worksheet():
         * escape_formulae
             If any text starts with an equals sign =, it will be prefixed with
             a apostrophe ', to avoid being interpreted as a formula.
+        * dry_run
+            Nothing is changed, instead a CostEstimate is returned.
 
         Note:
             A Google Spreadsheet may not (as of July 2015) have more than
@@ -200,52 +798,189 @@ class Worksheet():
             The name of the index is copied if both copy_index=True and
             copy_columns=True
         """
-        # x_pos, y_post is the position of the data, excluding any columns
-        y, x = df.shape
-        if copy_index is True:
-            x_pos += 1
-        if copy_columns is True:
-            y_pos += 1
+        rows, cols = _frame_size(df, x_pos, y_pos, copy_index, copy_columns)
+        if dry_run:
+            estimate = self._estimateResize(CostEstimate(), rows, cols,
+                                            exact=resize)
+            return self._estimateWrite(
+                estimate, _frame_cells(df, x_pos, y_pos, copy_index,
+                                       copy_columns, escape_formulae))
         if resize:
-            self.resize(y + y_pos - 1, x + x_pos - 1)
+            self.resize(rows, cols)
         else:
-            self.resizeToAtLeast(y + y_pos - 1, x + x_pos - 1)
-
-        updates = []
-
-        def update(up):
-            updates.append(up)
-
-        def str_repr(data):
-            """Get a representation of 'data' for a cell"""
-            if pd.isnull(data):
-                return ""
-            data = str(data)
-            if escape_formulae and data and data[0] == "=":
-                data = "'{}".format(data)
-            return str(data)
-
-        if copy_columns:
-            for i, col in enumerate(df.columns):
-                update((y_pos - 1, x_pos+i, str_repr(col)))
-        if copy_index:
-            for i, col in enumerate(df.index):
-                update((i+y_pos, x_pos-1, str_repr(col)))
-        if copy_columns and copy_index:
-            update((y_pos-1, x_pos-1, str_repr(df.index.name)))
-
-        for i, row in enumerate(df.values):
-            for j, v in enumerate(row):
-                update((i+y_pos, j+x_pos, str_repr(v)))
-
-        self._addCells(updates)
-
-    def _addCells(self, cells):
-        """Updates the referenced cells. *cells* is a list of tuples:
-            (row, col, content)
+            self.resizeToAtLeast(rows, cols)
+
+        updates = list(_frame_cells(df, x_pos, y_pos, copy_index,
+                                    copy_columns, escape_formulae))
+
+        try:
+            self._addCells(updates)
+        except PGSheetsHTTPException:
+            # the sheet may have been resized since its size was last known
+            known = self._info.rows, self._info.cols
+            self._getFeed()
+            if (self._info.rows, self._info.cols) == known:
+                raise
+            if resize:
+                self.resize(rows, cols)
+            else:
+                self.resizeToAtLeast(rows, cols)
+            self._addCells(updates)
+
+    def _growTo(self, rows, cols):
+        """Ensures a minimum size like resizeToAtLeast(), but adds rows in
+        large steps so a sheet written in chunks is rarely resized
+        """
+        known_rows = self._loadInfo('rows')
+        if rows > known_rows:
+            cols_after = max(cols, self._loadInfo('cols'))
+            rows = max(rows, min(known_rows * 2, _MAX_CELLS // cols_after))
+        self.resizeToAtLeast(rows, cols)
+
+    def setDataFrames(self,
+                      dfs,
+                      x_pos=1,
+                      y_pos=1,
+                      copy_index=True,
+                      copy_columns=True,
+                      resize=False,
+                      escape_formulae=False,
+                      ):
+        """Sets the values of an iterable of DataFrames, e.g. the chunks from
+        pd.read_csv(..., chunksize=n), one below the other starting at
+        x_pos, y_pos.
+
+        The arguments are as for setDataFrame(). The columns are only copied
+        from the first DataFrame, and all should have the same columns.
+
+        Each DataFrame is written while the next one is read and prepared, so
+        only a couple are held in memory at once. The sheet is grown in
+        large steps as needed and, once done, made no bigger than it needs to
+        be (or exactly the size of the data if resize=True).
+        Returns the number of cells written.
+        """
+        initial_rows = self._loadInfo('rows')
+        rows = cols = 0
+        written = 0
+        header = copy_columns
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = None
+            for df in dfs:
+                rows, cols = _frame_size(df, x_pos, y_pos, copy_index, header)
+                self._growTo(rows, cols)
+                cells = list(_frame_cells(df, x_pos, y_pos, copy_index,
+                                          header, escape_formulae))
+                # wait for the previous DataFrame, so one write is in flight
+                if pending is not None:
+                    written += pending.result().cells
+                pending = pool.submit(self._addCells, cells)
+                y_pos = rows + 1
+                header = False
+            if pending is not None:
+                written += pending.result().cells
+
+        if not rows:
+            return written
+        if resize:
+            self.resize(rows, cols)
+        elif self._info.rows > max(rows, initial_rows):
+            # remove any rows added beyond what is needed
+            self.resize(rows=max(rows, initial_rows))
+        return written
+
+    def copyTo(self, target, x_pos=1, y_pos=1, values=False,
+               chunk_rows=1000):
+        """Copies the cells of this worksheet to the *target* Worksheet, with
+        the top left cell placed at x_pos, y_pos.
+
+        Setting values=True copies the values of the cells, rather than
+        formulas.
+
+        The cells are read *chunk_rows* rows at a time, reading the next
+        chunk while the current one is written, and no DataFrame is created.
+        Cells which are empty in this worksheet are not cleared in the
+        target. Returns the number of cells copied.
+
+        This involves calling the Google API.
+        """
+        rows, cols = self._loadInfo('rows'), self._loadInfo('cols')
+        target.resizeToAtLeast(rows + y_pos - 1, cols + x_pos - 1)
+
+        def read(start):
+            return [
+                (row + y_pos - 1, col + x_pos - 1,
+                 value if values else input_value)
+                for row, col, input_value, value in self._getCells({
+                    'min-row': start,
+                    'max-row': min(start + chunk_rows - 1, rows)})]
+
+        copied = 0
+        starts = range(1, rows + 1, chunk_rows)
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            pending = reader.submit(read, starts[0]) if starts else None
+            for next_start in list(starts[1:]) + [None]:
+                cells = pending.result()
+                # read the next chunk while this one is written
+                if next_start is not None:
+                    pending = reader.submit(read, next_start)
+                target._addCells(cells)
+                copied += len(cells)
+        return copied
+
+    def writer(self, max_cells=1000, max_delay=1.0):
+        """Returns a CellWriter which buffers updates to individual cells.
+
+        Buffered cells are written when there are *max_cells* of them, when
+        the oldest is *max_delay* seconds old and when the writer is closed.
+        Use it as a context manager to ensure all cells are written:
+
+            >>> with w.writer() as writer:
+            ...     writer.setCell(1, 1, 'value')
+            ...     writer.setRange(2, 1, [['a', 'b'], ['c', 'd']])
+        """
+        return CellWriter(self, max_cells=max_cells, max_delay=max_delay)
+
+    def watch(self, callback, interval=60.0, values=False):
+        """Polls the worksheet every *interval* seconds in a background
+        thread, calling callback(worksheet, cells) with the (row, col, old,
+        new) of each cell changed since the last poll, see Watcher.
+
+        Only the worksheet's entry is retrieved while it is unchanged.
+        Setting values=True compares values rather than formulas. Call
+        stop() on the returned Watcher, or use it as a context manager, to
+        stop polling.
+        """
+        def worksheets():
+            self._getFeed()
+            return [self]
+        return Watcher(worksheets, callback, interval, values).start()
+
+    def _estimateWrite(self, estimate, cells, batch_size=None):
+        """Adds the requests made by writing *cells* in batches of
+        *batch_size* (by default one batch) to *estimate*
+        """
+        uri = len(self._info.cells_uri)
+        batch = 0
+        for row, col, content in cells:
+            if batch == 0 or batch == batch_size:
+                estimate.batches.append(0)
+                estimate.requests += 1
+                estimate.bytes_sent += _BATCH_BYTES + uri
+                batch = 0
+            batch += 1
+            estimate.batches[-1] += 1
+            estimate.cells += 1
+            # each entry holds the cell's uri twice and its id four times
+            estimate.bytes_sent += (_BATCH_ENTRY_BYTES + 2 * uri
+                                    + 4 * len('R{}C{}'.format(row, col))
+                                    + len(content))
+            estimate.bytes_received += _CELL_ENTRY_BYTES + 2 * len(content)
+        return estimate
+
+    def _postCells(self, cells):
+        """Posts a batch update of *cells*, a list of (row, col, content)
+        tuples, returning the response's {batch id: (code, reason)}
         """
-        if len(cells) == 0:
-            return
         feed = Element('feed', {
             'xmlns': 'http://www.w3.org/2005/Atom',
             'xmlns:batch': 'http://schemas.google.com/gdata/batch',
@@ -253,11 +988,7 @@ class Worksheet():
             })
 
         id_elem = SubElement(feed, 'id')
-        id_elem.text = (
-            _get_first(self._element.findall(_ns_w3('link')), 'rel',
-                       'http://schemas.google.com/spreadsheets/2006#cellsfeed')
-            .get('href')
-            )
+        id_elem.text = self._info.cells_uri
 
         def add_entry(feed, row, col, content):
             code = 'R{}C{}'.format(row, col)
@@ -275,43 +1006,117 @@ class Worksheet():
                 'col': str(col),
                 'inputValue': content})
 
+        keys = []
         for row, col, content in cells:
             add_entry(feed, row, col, content)
+            keys.append((id_elem.text, row, col))
 
         data = ElementTree.tostring(feed)
 
-        r = requests.post(
-            id_elem.text + '/batch',
-            data=data,
-            headers=self._token.getAuthorizationHeader({
-                'Content-Type': 'application/atom+xml', 'If-Match': '*'}))
+        # the cells are forgotten again once the request is done, as another
+        # thread may have cached their old contents while it was in progress
+        for key in keys:
+            cell_cache.invalidate(key)
+        try:
+            r = _request(
+                self._token, 'post',
+                id_elem.text + '/batch',
+                data=data,
+                headers={'Content-Type': 'application/atom+xml',
+                         'If-Match': '*'})
+        finally:
+            for key in keys:
+                cell_cache.invalidate(key)
+        return {batch_id: (code, reason) for batch_id, code, reason
+                in parse_batch_statuses(r.content)}
+
+    def _addCells(self, cells, retries=2):
+        """Updates the referenced cells. *cells* is a list of tuples:
+            (row, col, content)
 
-        _check_status(r)
+        Cells the API does not report as updated are sent again, up to
+        *retries* times. Returns a BatchResult, or raises a
+        PGSheetsBatchException if some cells could not be updated.
+        """
+        result = BatchResult(len(cells))
+        pending = {'R{}C{}'.format(row, col): (row, col, content)
+                   for row, col, content in cells}
+        while pending:
+            if result.requests:
+                time.sleep(
+                    self._BATCH_RETRY_DELAY * 2 ** (result.requests - 1))
+            start = time.monotonic()
+            statuses = self._postCells(list(pending.values()))
+            result.timings.append(time.monotonic() - start)
+
+            failed = {}
+            for batch_id, cell in pending.items():
+                code, reason = statuses.get(batch_id, (None, None))
+                if code is None or code // 100 != 2:
+                    failed[batch_id] = cell + (code, reason)
+            result.updated += len(pending) - len(failed)
+            result.failed = list(failed.values())
+            if len(result.timings) > retries:
+                break
+            pending = {batch_id: cell[:3]
+                       for batch_id, cell in failed.items()}
+
+        if result.failed:
+            raise PGSheetsBatchException(
+                "{} of {} cells could not be updated, e.g. {}"
+                .format(len(result.failed), result.cells, result.failed[0]),
+                result)
+        return result
 
     def __repr__(self):
         return "<{cls} title={title!r} sheet_key={id_!r}>".format(
             cls=self.__class__.__name__,
-            title=self._getTitle(self._element),
+            title=self._info.title,
             id_=self._getSheetKey())
 
 
 class _BaseSpreadsheet():
-    def __init__(self, token, element, **kwargs):
+    def __init__(self, token, element=None, key=None, **kwargs):
         self._token = token
-        self._element = element
+        if element is not None:
+            self._setEntry(element)
+        elif key is not None:
+            self._entry = None
+            self._info = _SpreadsheetInfo(key)
+        else:
+            raise PGSheetsValueError("Either an element or a key is required")
         super().__init__(**kwargs)
 
+    def _setEntry(self, element):
+        self._entry = element
+        self._info = _SpreadsheetInfo.fromElement(element)
+
+    def _getEntry(self):
+        url = ('{}/spreadsheets/private/full/{}'
+               .format(_FEEDS_URL, urllib.parse.quote(self._info.key)))
+        r = _request(self._token, 'get', url)
+        self._setEntry(ElementTree.fromstring(r.content.decode()))
+        return self._entry
+
+    @property
+    def _element(self):
+        """The spreadsheet entry, retrieved from the API if not yet known"""
+        if self._entry is None:
+            self._getEntry()
+        return self._entry
+
     def getKey(self):
-        return self._element.find(_ns_w3('id')).text.split('/')[-1]
+        return self._info.key
 
     def getTitle(self):
-        return self._element.find(_ns_w3('title')).text
+        if self._info.title is None:
+            self._getEntry()
+        return self._info.title
 
     def getURL(self):
-        return (_get_first(self._element.findall(_ns_w3('link')),
-                           'rel',
-                           'alternate')
-                .get('href'))
+        if self._info.url is None:
+            self._getEntry()
+        return self._info.url
 
     def getWorksheets(self):
         """Returns a list of Worksheet objects representing the worksheets of
@@ -319,15 +1124,11 @@ class _BaseSpreadsheet():
 
         This involves calling the Google API.
         """
-        link = self._element.find(_ns_w3('link'))
-        assert link.get('rel') == (
-            'http://schemas.google.com/spreadsheets/2006#worksheetsfeed')
-        r = requests.get(
-            link.get('href'), headers=self._token.getAuthorizationHeader())
-        _check_status(r)
-
-        e = ElementTree.fromstring(r.content.decode())
-        return [Worksheet(self._token, a) for a in e.findall(_ns_w3('entry'))]
+        entries = _get_shared(
+            self._token, self._info.worksheets_uri, 'entries',
+            lambda content: ElementTree.fromstring(content.decode())
+            .findall(_ns_w3('entry')))
+        return [Worksheet(self._token, a) for a in entries]
 
     def getWorksheet(self, title):
         """Get a worksheet with the given title.
@@ -336,10 +1137,19 @@ class _BaseSpreadsheet():
         """
         worksheets = self.getWorksheets()
         for w in worksheets:
-            if w._getTitle(w._element) == title:
+            if w._info.title == title:
                 return w
         raise ValueError('unavailable sheet {}'.format(title))
 
+    def getWorksheetById(self, worksheet_id):
+        """Get a worksheet from its id, see Worksheet.getWorksheetId().
+
+        This does not call the Google API, the worksheet's metadata is
+        retrieved when it is first needed.
+        """
+        return Worksheet(self._token, key=self.getKey(),
+                         worksheet_id=worksheet_id)
+
     def addWorksheet(self, title, rows=1, cols=1):
         """Adds a new worksheet to a spreadsheet.
         :param title: A title of a new worksheet.
@@ -356,27 +1166,59 @@ class _BaseSpreadsheet():
         SubElement(entry, 'gs:rowCount').text = str(rows)
         SubElement(entry, 'gs:colCount').text = str(cols)
 
-        key = self.getKey()
-        url = ('https://spreadsheets.google.com/feeds/worksheets/{}'
-                   '/private/full'.format(urllib.parse.quote(key)))
-        r = requests.post(
-            url,
+        r = _request(
+            self._token, 'post',
+            self._info.worksheets_uri,
             data=ElementTree.tostring(entry),
-            headers=self._token.getAuthorizationHeader(
-                {'Content-Type': 'application/atom+xml'})
-            )
-        _check_status(r)
+            headers={'Content-Type': 'application/atom+xml'})
         element = ElementTree.fromstring(r.content.decode())
         worksheet = Worksheet(self._token, element)
         return worksheet
 
+    def batchWrite(self, jobs, max_workers=4, batch_size=10000,
+                   progress=None):
+        """Writes several DataFrames at once, returning the number of cells
+        written for each.
+
+        *jobs* is a list of (worksheet, df) or (worksheet, df, options)
+        tuples, where worksheet is a Worksheet or the title of one and
+        options is a dict of keyword arguments as for
+        Worksheet.setDataFrame(). The remaining arguments are as for
+        pgsheets.upload.WriteScheduler, which can also write to the
+        worksheets of several spreadsheets.
+
+        This involves calling the Google API.
+        """
+        from pgsheets.upload import WriteScheduler
+        scheduler = WriteScheduler(max_workers, batch_size, progress)
+        titles = None
+        for job in jobs:
+            worksheet, df, options = (tuple(job) + ({},))[:3]
+            if not isinstance(worksheet, Worksheet):
+                if titles is None:
+                    titles = {w._info.title: w for w in self.getWorksheets()}
+                if worksheet not in titles:
+                    raise ValueError('unavailable sheet {}'.format(worksheet))
+                worksheet = titles[worksheet]
+            scheduler.add(worksheet, df, **options)
+        return scheduler.run()
+
+    def watch(self, callback, interval=60.0, values=False):
+        """Polls the worksheets every *interval* seconds in a background
+        thread, calling callback(worksheet, cells) with the (row, col, old,
+        new) of each cell changed since the last poll, see Watcher.
+
+        Each poll retrieves the worksheets feed, and only worksheets which
+        were updated are read again. Setting values=True compares values
+        rather than formulas. Call stop() on the returned Watcher, or use it
+        as a context manager, to stop polling.
+        """
+        return Watcher(self.getWorksheets, callback, interval,
+                       values).start()
+
     def removeWorksheet(self, worksheet):
-        url = _get_first(
-            worksheet._element.findall(_ns_w3('link')),
-            'rel',
-            'edit').get('href')
-        r = requests.delete(url, headers=self._token.getAuthorizationHeader())
-        _check_status(r)
+        url = worksheet._loadInfo('edit_uri')
+        _request(self._token, 'delete', url)
 
     def __repr__(self):
         return "<{cls} title={title!r} key={key!r}>".format(
@@ -385,28 +1227,25 @@ class _BaseSpreadsheet():
             key=self.getKey())
 
 class Spreadsheet(_BaseSpreadsheet):
-    def __init__(self, token, key, **kwargs):
+    def __init__(self, token, key, lazy=False, **kwargs):
         """Initialize a Spreadsheet
 
         The key is either the URL of your spreadsheet or the *key*
         part as shown below:
         https://docs.google.com/spreadsheets/d/{{key}}/edit
 
-        Initialization involves calling the Google API.
+        Initialization involves calling the Google API, unless lazy=True
+        in which case the spreadsheet's metadata is only retrieved when
+        needed (by getTitle() or getURL()).
         """
         # did we get a URL?
         m = re.match(r'^(?:https?://)?(?:www\.)?'
-                     'docs\.google\.com/spreadsheets/d/([^/]*)',
+                     r'docs\.google\.com/spreadsheets/d/([^/]*)',
                      key
                      )
         if m:
             key = m.group(1)
 
-        key = urllib.parse.quote(key)
-        url = ('https://spreadsheets.google.com/feeds/spreadsheets'
-               '/private/full/{}'.format(key))
-        r = requests.get(url, headers=token.getAuthorizationHeader())
-        _check_status(r)
-        element = ElementTree.fromstring(r.content.decode())
-
-        super().__init__(token=token, element=element, **kwargs)
+        super().__init__(token=token, key=key, **kwargs)
+        if not lazy:
+            self._getEntry()
@@ -0,0 +1,148 @@
+"""Parsing of Google API feeds.
+
+The standard library's ElementTree is used by default. lxml is available
+as a backend when it is installed, but benchmarks/bench_parsing.py shows
+it is no faster for cells feeds. Both backends give identical results.
+"""
+from array import array
+from io import BytesIO
+from xml.etree import ElementTree
+import importlib.util
+
+# lxml is only imported when first used, to keep importing pgsheets fast
+_has_lxml = importlib.util.find_spec('lxml') is not None
+
+_ATOM_ENTRY = '{http://www.w3.org/2005/Atom}entry'
+_SHEET_CELL = '{http://schemas.google.com/spreadsheets/2006}cell'
+_BATCH_ID = '{http://schemas.google.com/gdata/batch}id'
+_BATCH_STATUS = '{http://schemas.google.com/gdata/batch}status'
+
+BACKENDS = ('stdlib', 'lxml') if _has_lxml else ('stdlib',)
+default_backend = 'stdlib'
+
+
+def _parse_cells_lxml(content):
+    from lxml import etree
+    # only the cells are handed back to Python, and each entry is removed
+    # from the tree once read so memory stays low however large the feed
+    for _, cell in etree.iterparse(
+            BytesIO(content), events=('end',), tag=_SHEET_CELL,
+            huge_tree=True):
+        yield (int(cell.get('row')), int(cell.get('col')),
+               cell.get('inputValue'), cell.text or '')
+        entry = cell.getparent()
+        entry.clear()
+        while entry.getprevious() is not None:
+            del entry.getparent()[0]
+
+
+def _parse_cells_stdlib(content):
+    # each entry is emptied once read, leaving only a small element behind;
+    # removing entries from the feed needs 'start' events, which cost more
+    # than they save
+    for _, element in ElementTree.iterparse(BytesIO(content),
+                                            events=('end',)):
+        if element.tag == _SHEET_CELL:
+            yield (int(element.get('row')), int(element.get('col')),
+                   element.get('inputValue'), element.text or '')
+        elif element.tag == _ATOM_ENTRY:
+            element.clear()
+
+
+_CELL_PARSERS = {
+    'lxml': _parse_cells_lxml,
+    'stdlib': _parse_cells_stdlib,
+    }
+
+
+def parse_cells(content, backend=None):
+    """Yields (row, col, inputValue, value) for each cell of a cells feed.
+
+    *content* is the feed as bytes. *backend* is one of BACKENDS, by default
+    default_backend.
+    """
+    if backend is None:
+        backend = default_backend
+    return _CELL_PARSERS[backend](content)
+
+
+def _parse_cell_piece(content, backend):
+    rows, cols = array('i'), array('i')
+    input_values, values = [], []
+    for row, col, input_value, value in parse_cells(content, backend):
+        rows.append(row)
+        cols.append(col)
+        input_values.append(input_value)
+        values.append(value)
+    return rows, cols, input_values, values
+
+
+def split_feed(content, pieces):
+    """Splits a feed into at most *pieces* feeds, each holding a share of
+    the entries, by cutting the raw bytes at entry boundaries.
+
+    The feed is returned whole if its entries cannot be found.
+    """
+    first = content.find(b'<entry')
+    end = content.rfind(b'</feed>')
+    if pieces <= 1 or first == -1 or end == -1:
+        return [content]
+    head, tail = content[:first], content[end:]
+
+    bounds = [first]
+    step = (end - first) // pieces
+    for i in range(1, pieces):
+        cut = content.find(b'</entry>', max(first + i * step, bounds[-1]),
+                           end)
+        if cut == -1:
+            break
+        bounds.append(cut + len(b'</entry>'))
+    bounds.append(end)
+    return [head + content[start:stop] + tail
+            for start, stop in zip(bounds, bounds[1:]) if start < stop]
+
+
+def parse_cell_arrays(content, processes=None, backend=None):
+    """Parses a cells feed into a list of pieces, each a tuple of
+    (rows, cols, inputValues, values). rows and cols are compact int arrays.
+
+    With *processes* greater than 1 the feed is split at entry boundaries
+    and the pieces are parsed in that many processes.
+    """
+    backend = backend or default_backend
+    if not processes or processes <= 1:
+        return [_parse_cell_piece(content, backend)]
+    # imported here, as multiprocessing is slow to import
+    from concurrent.futures import ProcessPoolExecutor
+    feeds = split_feed(content, processes)
+    with ProcessPoolExecutor(max_workers=min(processes, len(feeds))) as pool:
+        return list(pool.map(_parse_cell_piece, feeds,
+                             [backend] * len(feeds)))
+
+
+def _iter_entries(content, backend):
+    """Yields each entry of a feed, which is cleared once the caller moves
+    on to the next
+    """
+    if backend == 'lxml':
+        from lxml import etree
+        entries = (e for _, e in etree.iterparse(
+            BytesIO(content), events=('end',), tag=_ATOM_ENTRY,
+            huge_tree=True))
+    else:
+        entries = (e for _, e in ElementTree.iterparse(
+            BytesIO(content), events=('end',)) if e.tag == _ATOM_ENTRY)
+    for entry in entries:
+        yield entry
+        entry.clear()
+
+
+def parse_batch_statuses(content, backend=None):
+    """Yields (batch id, status code, reason) for each entry of a batch
+    response feed. The code and reason are None if an entry has no status.
+    """
+    for entry in _iter_entries(content, backend or default_backend):
+        status = entry.find(_BATCH_STATUS)
+        yield (entry.findtext(_BATCH_ID),
+               None if status is None else int(status.get('code')),
+               None if status is None else status.get('reason'))
@@ -1,10 +1,14 @@
 import urllib.parse
 import json
 import datetime
+import threading
+import time
 
-import requests
+from pgsheets._lazy import lazy_import
+from pgsheets.exceptions import _check_status, PGSheetsValueError
 
-from pgsheets.exceptions import _check_status
+# only imported once used, see pgsheets._lazy
+requests = lazy_import('requests')
 
 
 class Client():
@@ -131,3 +135,117 @@ class Token():
             headers = {}
         headers['Authorization'] = "Bearer " + self._getValidToken()
         return headers
+
+
+class TokenPool():
+    """Spreads API calls over several Token objects, e.g. for different
+    users or clients, so their quotas are shared.
+
+    A TokenPool can be used wherever a Token is:
+
+        >>> pool = TokenPool([Token(c, refresh_1), Token(c, refresh_2)])
+        >>> s = Spreadsheet(pool, my_url)
+
+    Tokens are chosen in turn with strategy='round-robin', or the token with
+    the fewest requests in progress with strategy='least-loaded'. A token
+    whose request is throttled (HTTP 429) is not used for *cooldown*
+    seconds, and the request is made again with another token.
+
+    A request counts as in progress from getAuthorizationHeader() until
+    release() is called with its headers, which pgsheets does for its own
+    requests. Code making its own requests with the headers should call
+    release() too, otherwise least-loaded sees them as never finishing.
+    """
+    _STRATEGIES = ('round-robin', 'least-loaded')
+
+    def __init__(self, tokens, strategy='round-robin', cooldown=60,
+                 **kwargs):
+        super().__init__(**kwargs)
+        if strategy not in self._STRATEGIES:
+            raise PGSheetsValueError(
+                "strategy must be one of {}".format(self._STRATEGIES))
+        self._tokens = list(tokens)
+        if not self._tokens:
+            raise PGSheetsValueError("A TokenPool needs at least one token")
+        self._strategy = strategy
+        self._cooldown = cooldown
+        self._lock = threading.Lock()
+        self._next = 0
+        self._in_flight = [0] * len(self._tokens)
+        self._requests = [0] * len(self._tokens)
+        self._throttled = [0] * len(self._tokens)
+        self._cool_until = [0.0] * len(self._tokens)
+        # authorization header -> [index of its token, requests in progress]
+        self._headers = {}
+
+    def _available(self, now):
+        return [i for i, until in enumerate(self._cool_until) if until <= now]
+
+    def _choose(self):
+        now = time.monotonic()
+        available = self._available(now)
+        if not available:
+            # every token is throttled, use the one available soonest
+            return min(range(len(self._tokens)),
+                       key=self._cool_until.__getitem__)
+        if self._strategy == 'least-loaded':
+            return min(available, key=lambda i: (self._in_flight[i],
+                                                 self._requests[i]))
+        n = len(self._tokens)
+        i = min(available, key=lambda i: (i - self._next) % n)
+        self._next = (i + 1) % n
+        return i
+
+    def getAuthorizationHeader(self, headers=None):
+        """Returns a dictionary containing a Authorization header, of the
+        next token to use.
+        If a dictionary is supplied the Authorization header is added.
+        """
+        with self._lock:
+            i = self._choose()
+            self._in_flight[i] += 1
+            self._requests[i] += 1
+        try:
+            headers = self._tokens[i].getAuthorizationHeader(headers)
+        except Exception:
+            with self._lock:
+                self._in_flight[i] -= 1
+            raise
+        with self._lock:
+            self._headers.setdefault(headers['Authorization'], [i, 0])[1] += 1
+        return headers
+
+    def release(self, headers, status_code=None):
+        """Records that the request made with *headers* (as returned by
+        getAuthorizationHeader()) has finished, with the HTTP *status_code*
+        of its response or None if it failed. Returns True if it was
+        throttled and another token is available to retry it with.
+        """
+        with self._lock:
+            entry = self._headers.get(headers.get('Authorization'))
+            if entry is None:
+                return False
+            i = entry[0]
+            entry[1] -= 1
+            if not entry[1]:
+                del self._headers[headers['Authorization']]
+            self._in_flight[i] -= 1
+            if status_code != 429:
+                return False
+            self._throttled[i] += 1
+            now = time.monotonic()
+            self._cool_until[i] = now + self._cooldown
+            return bool(self._available(now))
+
+    def getUsage(self):
+        """Returns a list with a dictionary for each token, with the keys:
+            token, requests, in_flight, throttled, cooling_down
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{'token': token,
+                     'requests': self._requests[i],
+                     'in_flight': self._in_flight[i],
+                     'throttled': self._throttled[i],
+                     'cooling_down': self._cool_until[i] > now}
+                    for i, token in enumerate(self._tokens)]
@@ -0,0 +1,279 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import hashlib
+import itertools
+import json
+import os
+
+from pgsheets._lazy import lazy_import
+from pgsheets.exceptions import PGSheetsValueError
+from pgsheets.models import CostEstimate, _frame_cells, _frame_size, \
+    _MAX_CELLS
+
+# only imported once used, see pgsheets._lazy
+pd = lazy_import('pandas')
+
+
+class UploadPlan():
+    """Splits writing a DataFrame to a worksheet into ordered batches of at
+    most *batch_size* cells, which can be resumed after a failure.
+
+    The remaining arguments are as for Worksheet.setDataFrame():
+
+        >>> plan = UploadPlan(df, batch_size=10000)
+        >>> plan.run(w, checkpoint='upload.json')
+
+    Should run() fail it can be called again with the same checkpoint file,
+    and only the batches which were not confirmed are written.
+    """
+
+    def __init__(self, df, x_pos=1, y_pos=1, copy_index=True,
+                 copy_columns=True, escape_formulae=False, batch_size=10000,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self._df = df
+        self._layout = (x_pos, y_pos, copy_index, copy_columns)
+        self._escape_formulae = escape_formulae
+        self.batch_size = batch_size
+        self._fingerprint = None
+        self.rows, self.cols = _frame_size(df, *self._layout)
+        if self.rows * self.cols > _MAX_CELLS:
+            raise PGSheetsValueError(
+                "No sheet may be more than {} cells large".format(_MAX_CELLS)
+                )
+
+    @property
+    def cells(self):
+        """The number of cells which are written"""
+        y, x = self._df.shape
+        copy_index, copy_columns = self._layout[2:]
+        return (y + bool(copy_columns)) * (x + bool(copy_index))
+
+    def __len__(self):
+        """The number of batches"""
+        return -(-self.cells // self.batch_size)
+
+    def batches(self, start=0):
+        """Yields (index, cells) for each batch from *start* onwards, where
+        cells is a list of (row, col, content) tuples
+        """
+        cells = _frame_cells(self._df, *self._layout,
+                             escape_formulae=self._escape_formulae)
+        cells = itertools.islice(cells, start * self.batch_size, None)
+        for index in itertools.count(start):
+            batch = list(itertools.islice(cells, self.batch_size))
+            if not batch:
+                return
+            yield index, batch
+
+    def fingerprint(self):
+        """Identifies the data and batching of this plan, so a checkpoint is
+        only resumed by the same upload
+        """
+        if self._fingerprint is not None:
+            return self._fingerprint
+        h = hashlib.sha1(json.dumps([
+            list(self._df.shape), [str(c) for c in self._df.columns],
+            str(self._df.index.name), list(self._layout),
+            self._escape_formulae, self.batch_size,
+            ]).encode())
+        h.update(pd.util.hash_pandas_object(
+            self._df, index=True).values.tobytes())
+        self._fingerprint = h.hexdigest()
+        return self._fingerprint
+
+    def estimate(self, worksheet, start=0):
+        """Returns a CostEstimate of run() from batch *start* onwards,
+        without calling the Google API
+        """
+        estimate = worksheet._estimateResize(CostEstimate(), self.rows,
+                                             self.cols)
+        cells = itertools.chain.from_iterable(
+            batch for _, batch in self.batches(start))
+        return worksheet._estimateWrite(estimate, cells, self.batch_size)
+
+    def _readCheckpoint(self, checkpoint):
+        """Returns the number of batches already confirmed"""
+        try:
+            with open(checkpoint) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        if data.get('fingerprint') != self.fingerprint():
+            raise PGSheetsValueError(
+                "Checkpoint {} is for a different upload".format(checkpoint))
+        return data['completed']
+
+    def _writeCheckpoint(self, checkpoint, completed):
+        # write then rename, so a crash never leaves a partial checkpoint
+        tmp = checkpoint + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint(),
+                       'completed': completed,
+                       'batches': len(self)}, f)
+        os.replace(tmp, checkpoint)
+
+    def run(self, worksheet, checkpoint=None):
+        """Writes the batches to *worksheet*, resizing it if it is too small.
+
+        If *checkpoint* is a file path, progress is recorded there after
+        each batch and an earlier, failed run is resumed. The file is
+        removed once every batch is written.
+
+        This involves calling the Google API.
+        """
+        start = 0
+        if checkpoint is not None:
+            start = self._readCheckpoint(checkpoint)
+
+        worksheet.resizeToAtLeast(self.rows, self.cols)
+        for index, batch in self.batches(start):
+            worksheet._addCells(batch)
+            if checkpoint is not None:
+                self._writeCheckpoint(checkpoint, index + 1)
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+
+class WriteScheduler():
+    """Writes many DataFrames to worksheets of any number of spreadsheets.
+
+        >>> scheduler = WriteScheduler(max_workers=8)
+        >>> scheduler.add(w1, df1)
+        >>> scheduler.add(w2, df2, resize=True)
+        >>> scheduler.run()
+
+    The arguments of add() are as for Worksheet.setDataFrame(). Each
+    worksheet is resized once, up front, to fit all of its DataFrames.
+    The cells are then written in batches of *batch_size*, with at most
+    *max_workers* batches in progress at once. Batches are shared fairly:
+    each slot goes to the spreadsheet with the fewest batches in progress,
+    and in turn to each of its DataFrames.
+
+    *progress*, if given, is called as progress(job, written, total) after
+    each batch, where job is the index returned by add().
+
+    DataFrames written to the same worksheet should not overlap, as their
+    batches may be written in any order.
+    """
+
+    def __init__(self, max_workers=4, batch_size=10000, progress=None,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self._progress = progress
+        # (worksheet, UploadPlan, resize) for each DataFrame
+        self._jobs = []
+
+    def add(self, worksheet, df, x_pos=1, y_pos=1, copy_index=True,
+            copy_columns=True, resize=False, escape_formulae=False):
+        """Adds a DataFrame to write, returning its job index"""
+        plan = UploadPlan(df, x_pos, y_pos, copy_index, copy_columns,
+                          escape_formulae, self.batch_size)
+        self._jobs.append((worksheet, plan, resize))
+        return len(self._jobs) - 1
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _resizes(self):
+        """Returns (worksheet, rows, cols, exact) for each worksheet, sized
+        to fit all of its DataFrames. The size is exact if any of them was
+        added with resize=True.
+        """
+        sizes = OrderedDict()
+        for worksheet, plan, resize in self._jobs:
+            key = (worksheet._info.sheet_key, worksheet._info.worksheet_id)
+            worksheet, rows, cols, exact = sizes.get(
+                key, (worksheet, 0, 0, False))
+            sizes[key] = (worksheet, max(rows, plan.rows),
+                          max(cols, plan.cols), exact or resize)
+        return list(sizes.values())
+
+    def estimate(self):
+        """Returns a CostEstimate of run(), without calling the Google API"""
+        estimate = CostEstimate()
+        for worksheet, rows, cols, exact in self._resizes():
+            worksheet._estimateResize(estimate, rows, cols, exact)
+        for worksheet, plan, _ in self._jobs:
+            worksheet._estimateWrite(
+                estimate, itertools.chain.from_iterable(
+                    batch for _, batch in plan.batches()),
+                self.batch_size)
+        return estimate
+
+    @staticmethod
+    def _nextBatch(queues, running):
+        """Returns (spreadsheet key, job, cells) of the next batch to write,
+        or None once every batch has been taken
+        """
+        while queues:
+            # ties go to the spreadsheet which has waited longest
+            key = min(queues, key=lambda k: running[k])
+            queues.move_to_end(key)
+            jobs = queues[key]
+            job, batches = jobs[0]
+            jobs.rotate(-1)
+            batch = next(batches, None)
+            if batch is None:
+                jobs.pop()
+                if not jobs:
+                    del queues[key]
+                continue
+            return key, job, batch[1]
+        return None
+
+    def run(self):
+        """Resizes the worksheets then writes every DataFrame, returning the
+        number of cells written for each job.
+
+        The first error stops any more batches being started, and is raised
+        once those in progress have finished.
+
+        This involves calling the Google API.
+        """
+        written = [0] * len(self._jobs)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for future in [pool.submit(
+                    worksheet.resize if exact else worksheet.resizeToAtLeast,
+                    rows, cols)
+                    for worksheet, rows, cols, exact in self._resizes()]:
+                future.result()
+
+            queues = OrderedDict()
+            running = {}
+            for job, (worksheet, plan, _) in enumerate(self._jobs):
+                key = worksheet._info.sheet_key
+                queues.setdefault(key, deque()).append((job, plan.batches()))
+                running[key] = 0
+
+            in_progress = {}
+            error = None
+            while True:
+                while error is None and len(in_progress) < self.max_workers:
+                    batch = self._nextBatch(queues, running)
+                    if batch is None:
+                        break
+                    key, job, cells = batch
+                    running[key] += 1
+                    future = pool.submit(self._jobs[job][0]._addCells, cells)
+                    in_progress[future] = (key, job, len(cells))
+                if not in_progress:
+                    break
+
+                done, _ = wait(in_progress, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, job, cells = in_progress.pop(future)
+                    running[key] -= 1
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    written[job] += cells
+                    if self._progress is not None:
+                        self._progress(job, written[job],
+                                       self._jobs[job][1].cells)
+            if error is not None:
+                raise error
+        return written
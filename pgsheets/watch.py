@@ -0,0 +1,101 @@
+import threading
+
+
+class Watcher():
+    """Polls worksheets for changes and reports the cells which changed.
+
+    Do not initialize manually, instead use Spreadsheet.watch() or
+    Worksheet.watch():
+
+        >>> def changed(worksheet, cells):
+        ...     for row, col, old, new in cells:
+        ...         print(row, col, old, new)
+        >>> with s.watch(changed, interval=30):
+        ...     time.sleep(3600)
+
+    Each poll retrieves the worksheets' entries, and only worksheets whose
+    updated timestamp has changed are read again. Their cells are compared
+    with those of the previous read, and *callback* is called with the
+    worksheet and a list of (row, col, old, new) for each cell which
+    changed, empty cells being ''. The first poll only records the cells.
+
+    Polling stops at the first error, which stop() raises.
+    """
+
+    def __init__(self, get_worksheets, callback, interval=60.0, values=False,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self._get_worksheets = get_worksheets
+        self._callback = callback
+        self._interval = interval
+        self._values = values
+        # worksheet id -> (updated timestamp, {(row, col): content})
+        self._snapshots = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._error = None
+
+    def _read(self, worksheet):
+        return {(row, col): value if self._values else input_value
+                for row, col, input_value, value in worksheet._getCells()}
+
+    def poll(self):
+        """Checks the worksheets once, calling the callback for each which
+        changed.
+
+        This involves calling the Google API.
+        """
+        first = self._snapshots is None
+        previous = self._snapshots or {}
+        snapshots = {}
+        for worksheet in self._get_worksheets():
+            info = worksheet._info
+            updated, cells = previous.get(info.worksheet_id, (None, {}))
+            if not first and updated is not None and updated == info.updated:
+                snapshots[info.worksheet_id] = (updated, cells)
+                continue
+
+            new_cells = self._read(worksheet)
+            snapshots[info.worksheet_id] = (info.updated, new_cells)
+            if first:
+                continue
+            changes = [(row, col, cells.get((row, col), ''), new)
+                       for (row, col), new in new_cells.items()
+                       if cells.get((row, col), '') != new]
+            changes.extend((row, col, old, '')
+                           for (row, col), old in cells.items()
+                           if (row, col) not in new_cells and old != '')
+            if changes:
+                self._callback(worksheet, sorted(changes))
+        self._snapshots = snapshots
+
+    def _run(self):
+        try:
+            while True:
+                self.poll()
+                if self._stopped.wait(self._interval):
+                    return
+        except Exception as e:
+            self._error = e
+
+    def start(self):
+        """Polls every *interval* seconds in a background thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops polling, raising any error which stopped it earlier"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
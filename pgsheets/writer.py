@@ -0,0 +1,115 @@
+import threading
+
+
+class CellWriter():
+    """Buffers cell updates to a worksheet and writes them in batches.
+
+    Do not initialize manually, instead use Worksheet.writer():
+
+        >>> with w.writer() as writer:
+        ...     writer.setCell(1, 1, 'value')
+
+    Repeated writes to the same cell only send the last value. The buffer
+    is written when it holds *max_cells* cells, when the oldest buffered
+    update is *max_delay* seconds old, and when the writer is closed.
+
+    A CellWriter may be shared between threads.
+    """
+
+    def __init__(self, worksheet, max_cells=1000, max_delay=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self._worksheet = worksheet
+        self._max_cells = max_cells
+        self._max_delay = max_delay
+        self._pending = {}
+        # _lock guards the buffer, _flush_lock keeps the batches in order
+        self._lock = threading.Lock()
+        self._flush_lock = threading.RLock()
+        self._timer = None
+        self._error = None
+        self._closed = False
+
+    def setCell(self, row, col, value):
+        """Sets the content of a single cell, counting from 1"""
+        self._set([(row, col, value)])
+
+    def setRange(self, row, col, values):
+        """Sets a block of cells with its top left cell at row, col.
+
+        *values* is a sequence of rows, each a sequence of cell contents.
+        """
+        self._set([(row + i, col + j, v)
+                   for i, values_row in enumerate(values)
+                   for j, v in enumerate(values_row)])
+
+    def _set(self, cells):
+        self._raiseError()
+        with self._lock:
+            if self._closed:
+                raise ValueError('write to a closed CellWriter')
+            for row, col, value in cells:
+                # re-insert so the cell is ordered by its latest update
+                self._pending.pop((row, col), None)
+                self._pending[(row, col)] = (
+                    "" if value is None else str(value))
+            full = len(self._pending) >= self._max_cells
+            if not full and self._timer is None and self._pending:
+                self._timer = threading.Timer(self._max_delay,
+                                              self._timedFlush)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def _timedFlush(self):
+        # the error is recorded before another flush can start, and so
+        # before a successful one can clear it
+        with self._flush_lock:
+            try:
+                self.flush()
+            except Exception as e:
+                self._error = e
+
+    def _raiseError(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def flush(self):
+        """Writes all buffered cells. If this fails they stay buffered, to
+        be written by the next flush.
+
+        This involves calling the Google API.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            try:
+                self._worksheet._addCells(
+                    [(row, col, value)
+                     for (row, col), value in pending.items()])
+            except BaseException:
+                # keep the cells for the next flush, unless they were set
+                # again meanwhile
+                with self._lock:
+                    pending.update(self._pending)
+                    self._pending = pending
+                raise
+            # the cells of an earlier, failed flush have now been written
+            self._error = None
+
+    def close(self):
+        """Writes all buffered cells, after which no more can be set"""
+        with self._lock:
+            self._closed = True
+        self.flush()
+        self._raiseError()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
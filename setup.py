@@ -30,6 +30,10 @@ if __name__ == '__main__':
           license="MIT",
           url="https://github.com/henrystokeley/pgsheets",
           install_requires=requirements,
+          extras_require={'lxml': ['lxml'], 'parquet': ['pyarrow']},
+          entry_points={
+              'console_scripts': ['pgsheets = pgsheets.cli:main'],
+              },
           test_suite='test',
           classifiers=[
               'Development Status :: 3 - Alpha',
@@ -45,7 +45,8 @@ def get_spreadsheet_element(key="test_key", title="title"):
                 title=title))
     return data.encode()
 
-def get_worksheet_entry(key, sheet_title, encode=True):
+def get_worksheet_entry(key, sheet_title, encode=True, rows=2, cols=2,
+                        updated="2015-07-18T05:29:31.112Z"):
     open_tag = ("<entry>" if not encode else 
         "<entry xmlns='http://www.w3.org/2005/Atom'"
         " xmlns:gs='http://schemas.google.com/spreadsheets/2006'>"
@@ -54,7 +55,7 @@ def get_worksheet_entry(key, sheet_title, encode=True):
         "{open_tag}"
         "<id>https://spreadsheets.google.com/feeds/worksheets/{key}/"
         "private/full/{id}</id>"
-        "<updated>2015-07-18T05:29:31.112Z</updated>"
+        "<updated>{updated}</updated>"
         "<category scheme='http://schemas.google.com/spreadsheets/"
         "2006' term='http://schemas.google.com/spreadsheets/2006#"
         "worksheet'/>"
@@ -82,8 +83,9 @@ def get_worksheet_entry(key, sheet_title, encode=True):
         "<gs:colCount>{col_count}</gs:colCount>"
         "<gs:rowCount>{row_count}</gs:rowCount>"
         "</entry>"
-        .format(open_tag=open_tag, key=key, col_count=2, row_count=2,
-                sheet_title=sheet_title, id="od6", version="CCCC")
+        .format(open_tag=open_tag, key=key, col_count=cols, row_count=rows,
+                sheet_title=sheet_title, id="od6", version="CCCC",
+                updated=updated)
         )
     
     return content.encode() if encode else content
@@ -138,3 +140,70 @@ def get_worksheets_feed(key, sheet_names=["title"]):
                 entries=entries,
                 results=len(sheet_names)))
     return data.encode()
+
+def get_cells_feed(key, cells, worksheet_id="od6"):
+    """*cells* is a list of (row, col, inputValue, value) tuples"""
+    entries = "".join(
+        "<entry>"
+        "<id>https://spreadsheets.google.com/feeds/cells/{key}/{id}/"
+        "private/full/R{row}C{col}</id>"
+        "<title type='text'>R{row}C{col}</title>"
+        "<link rel='self' type='application/atom+xml' href='https://"
+        "spreadsheets.google.com/feeds/cells/{key}/{id}/private/full/"
+        "R{row}C{col}'/>"
+        "<gs:cell row='{row}' col='{col}' inputValue='{input}'>{value}"
+        "</gs:cell>"
+        "</entry>"
+        .format(key=key, id=worksheet_id, row=row, col=col, input=input_,
+                value=value)
+        for row, col, input_, value in cells)
+
+    data = (
+        "<?xml version='1.0' encoding='UTF-8'?>"
+        "<feed xmlns='http://www.w3.org/2005/Atom'"
+        " xmlns:openSearch='http://a9.com/-/spec/opensearchrss/1.0/'"
+        " xmlns:batch='http://schemas.google.com/gdata/batch'"
+        " xmlns:gs='http://schemas.google.com/spreadsheets/2006'>"
+        "<id>https://spreadsheets.google.com/feeds/cells/{key}/{id}/"
+        "private/full</id>"
+        "<updated>2015-07-18T05:29:31.140Z</updated>"
+        "<title type='text'>Sheet1</title>"
+        "<link rel='self' type='application/atom+xml' href='https://"
+        "spreadsheets.google.com/feeds/cells/{key}/{id}/private/full'/>"
+        "<openSearch:totalResults>{results}</openSearch:totalResults>"
+        "<openSearch:startIndex>1</openSearch:startIndex>"
+        "{entries}"
+        "</feed>"
+        .format(key=key, id=worksheet_id, entries=entries,
+                results=len(cells)))
+    return data.encode()
+
+def get_batch_response(key, cells, failed=(), worksheet_id="od6"):
+    """The response to a batch update of *cells*, a list of (row, col)
+    tuples. Cells in *failed* get a 409 status.
+    """
+    entries = "".join(
+        "<entry>"
+        "<batch:id>R{row}C{col}</batch:id>"
+        "<batch:operation type='update'/>"
+        "<batch:status code='{code}' reason='{reason}'/>"
+        "<id>https://spreadsheets.google.com/feeds/cells/{key}/{id}/"
+        "private/full/R{row}C{col}</id>"
+        "<gs:cell row='{row}' col='{col}' inputValue=''/>"
+        "</entry>"
+        .format(key=key, id=worksheet_id, row=row, col=col,
+                code=409 if (row, col) in failed else 200,
+                reason='Conflict' if (row, col) in failed else 'Success')
+        for row, col in cells)
+    data = (
+        "<?xml version='1.0' encoding='UTF-8'?>"
+        "<feed xmlns='http://www.w3.org/2005/Atom'"
+        " xmlns:batch='http://schemas.google.com/gdata/batch'"
+        " xmlns:gs='http://schemas.google.com/spreadsheets/2006'>"
+        "<id>https://spreadsheets.google.com/feeds/cells/{key}/{id}/"
+        "private/full/batch</id>"
+        "<title type='text'>Batch Feed</title>"
+        "{entries}"
+        "</feed>"
+        .format(key=key, id=worksheet_id, entries=entries))
+    return data.encode()
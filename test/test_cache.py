@@ -0,0 +1,140 @@
+from unittest import TestCase
+from unittest.mock import patch
+from array import array
+import os
+import tempfile
+import threading
+import time
+
+from pgsheets.cache import LRUCache, Coalescer, SnapshotCache
+
+
+class TestLRUCache(TestCase):
+
+    def test_maxsize(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # 'b' is now the least recently used
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a'))
+
+    @patch("pgsheets.cache.time.monotonic")
+    def test_ttl(self, monotonic):
+        cache = LRUCache(ttl=10)
+        monotonic.return_value = 100
+        cache.set('a', 1)
+        monotonic.return_value = 110
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 111
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(len(cache), 0)
+
+
+class TestCoalescer(TestCase):
+
+    def test_shared_call(self):
+        coalescer = Coalescer()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return object()
+
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(coalescer.call('key', slow)))
+            for _ in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        # give the other threads time to wait on the first call
+        time.sleep(0.05)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(r is results[0] for r in results))
+
+        # a later call is made again
+        self.assertIsNot(coalescer.call('key', slow), results[0])
+        self.assertEqual(len(calls), 2)
+
+    def test_shared_exception(self):
+        coalescer = Coalescer()
+
+        def fail():
+            raise KeyError('failed')
+
+        with self.assertRaises(KeyError):
+            coalescer.call('key', fail)
+        self.assertEqual(coalescer._calls, {})
+
+
+class TestSnapshotCache(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cache = SnapshotCache(self.dir.name)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_roundtrip(self):
+        pieces = [(array('i', [1, 2]), array('i', [1, 3]), ['a', '=1+1'],
+                   ['a', '2']),
+                  (array('i', [5]), array('i', [2]), ['\u00e9t\u00e9'],
+                   ['\u00e9t\u00e9'])]
+        self.assertIsNone(self.cache.get('key/1', 'od6', 'v1'))
+        self.cache.set('key/1', 'od6', 'v1', pieces)
+
+        (rows, cols, input_values, values), = self.cache.get(
+            'key/1', 'od6', 'v1')
+        self.assertEqual(list(rows), [1, 2, 5])
+        self.assertEqual(list(cols), [1, 3, 2])
+        self.assertEqual(list(input_values), ['a', '=1+1', '\u00e9t\u00e9'])
+        self.assertEqual(list(values), ['a', '2', '\u00e9t\u00e9'])
+
+        # a newer timestamp replaces the snapshot
+        self.assertIsNone(self.cache.get('key/1', 'od6', 'v2'))
+        self.cache.set('key/1', 'od6', 'v2', pieces[1:])
+        self.assertIsNone(self.cache.get('key/1', 'od6', 'v1'))
+        self.assertEqual(len(self.cache.get('key/1', 'od6', 'v2')[0][0]), 1)
+        self.assertEqual(len(os.listdir(os.path.join(
+            self.dir.name, 'key%2F1', 'od6'))), 1)
+
+        self.cache.invalidate('key/1', 'od6')
+        self.assertIsNone(self.cache.get('key/1', 'od6', 'v2'))
+
+    def test_errors(self):
+        pieces = [(array('i', [1]), array('i', [1]), ['a'], ['a'])]
+        # a location which cannot be written, as it is below a file
+        path = os.path.join(self.dir.name, 'file')
+        open(path, 'w').close()
+        cache = SnapshotCache(os.path.join(path, 'snapshots'))
+        cache.set('key', 'od6', 'v1', pieces)
+        self.assertIsNone(cache.get('key', 'od6', 'v1'))
+
+        # a corrupt snapshot is missing
+        self.cache.set('key', 'od6', 'v1', pieces)
+        version = os.path.join(self.dir.name, 'key', 'od6',
+                               os.listdir(os.path.join(
+                                   self.dir.name, 'key', 'od6'))[0])
+        with open(os.path.join(version, 'rows.npy'), 'wb') as f:
+            f.write(b'corrupt')
+        self.assertIsNone(self.cache.get('key', 'od6', 'v1'))
+        with open(os.path.join(version, 'meta.json'), 'w') as f:
+            f.write('{')
+        self.assertIsNone(self.cache.get('key', 'od6', 'v1'))
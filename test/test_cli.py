@@ -0,0 +1,89 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+import io
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from pgsheets import cli
+from pgsheets.exceptions import PGSheetsValueError
+
+
+class TestCli(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_parse_range(self):
+        self.assertEqual(cli.parse_range('B2:D10'), (2, 2, 10, 4))
+        self.assertEqual(cli.parse_range('a:ab'), (None, 1, None, 28))
+        self.assertEqual(cli.parse_range('3:5'), (3, None, 5, None))
+        self.assertEqual(cli.parse_range('C4:'), (4, 3, None, None))
+        for bad in ['', ':', 'B2', '2B:C3']:
+            with self.assertRaises(PGSheetsValueError):
+                cli.parse_range(bad)
+
+    def test_get_token(self):
+        path = os.path.join(self.dir.name, 'token.json')
+        with open(path, 'w') as f:
+            json.dump({'client_id': 'file_id', 'client_secret': 'secret',
+                       'refresh_token': 'file_token'}, f)
+        environ = {'PGSHEETS_TOKEN_FILE': path,
+                   'PGSHEETS_REFRESH_TOKEN': 'env_token'}
+        token = cli.get_token(client_id='arg_id', environ=environ)
+        self.assertEqual(token._client._client_id, 'arg_id')
+        self.assertEqual(token._client._client_secret, 'secret')
+        self.assertEqual(token._refresh_token, 'env_token')
+
+        with self.assertRaises(PGSheetsValueError):
+            cli.get_token(client_id='arg_id', environ={})
+
+    def test_export(self):
+        worksheet = MagicMock()
+        worksheet._loadInfo.side_effect = {'rows': 5, 'cols': 3}.get
+        worksheet._getCells.side_effect = [
+            [(1, 1, 'a', 'a'), (1, 2, '=1+1', '2'), (2, 1, 'b', 'b')],
+            [(4, 3, 'c', 'c')],
+            [],
+            ]
+        path = os.path.join(self.dir.name, 'out.csv')
+        progress = cli._Progress('test', stream=io.StringIO())
+        cli.export_worksheet(worksheet, path, values=True, chunk_rows=2,
+                             progress=progress)
+
+        self.assertEqual(
+            [c[0][0] for c in worksheet._getCells.call_args_list], [
+                {'min-row': 1, 'max-row': 2, 'min-col': 1, 'max-col': 3},
+                {'min-row': 3, 'max-row': 4, 'min-col': 1, 'max-col': 3},
+                {'min-row': 5, 'max-row': 5, 'min-col': 1, 'max-col': 3},
+                ])
+        with open(path) as f:
+            # the trailing empty row is dropped
+            self.assertEqual(f.read().splitlines(),
+                             ['a,2,', 'b,,', ',,', ',,c'])
+        self.assertEqual((progress.rows, progress.cells), (5, 15))
+
+    def test_import(self):
+        path = os.path.join(self.dir.name, 'in.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n1,2\n3,\n')
+        worksheet = MagicMock()
+        chunks = []
+        worksheet.setDataFrames.side_effect = (
+            lambda dfs, **kwargs: chunks.extend(dfs))
+        progress = cli._Progress('test', stream=io.StringIO())
+        cli.import_worksheet(worksheet, path, row=2, col=3, chunk_rows=2,
+                             progress=progress)
+
+        args, kwargs = worksheet.setDataFrames.call_args
+        self.assertEqual(kwargs, {'x_pos': 3, 'y_pos': 2, 'copy_index': False,
+                                  'copy_columns': False})
+        self.assertEqual((progress.rows, progress.cells), (3, 6))
+        self.assertEqual(len(chunks), 2)
+        pd.testing.assert_frame_equal(
+            chunks[1], pd.DataFrame([['3', '']], index=[2]))
@@ -0,0 +1,49 @@
+from unittest import TestCase
+import subprocess
+import sys
+
+CODE = """
+import sys
+import {module}
+print(','.join(m for m in ('pandas.core', 'requests.api', 'lxml.etree')
+               if m in sys.modules))
+"""
+
+THREADS = """
+import threading
+from pgsheets.models import pd, _cells_frame
+from array import array
+barrier = threading.Barrier(8)
+errors = []
+
+def first_use():
+    barrier.wait()
+    try:
+        _cells_frame([(array('i', [1]), array('i', [1]), ['a'], ['a'])])
+        pd.DataFrame([[1]])
+    except Exception as e:
+        errors.append(e)
+
+threads = [threading.Thread(target=first_use) for _ in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(errors)
+"""
+
+
+class TestImport(TestCase):
+
+    def test_lazy_dependencies(self):
+        # importing pgsheets does not import its heavy dependencies
+        for module in ['pgsheets', 'pgsheets.token', 'pgsheets.upload']:
+            out = subprocess.check_output(
+                [sys.executable, '-c', CODE.format(module=module)])
+            self.assertEqual(out.decode().strip(), '', module)
+
+    def test_concurrent_first_use(self):
+        # threads using a lazily imported module for the first time at once
+        # all wait for the import to finish
+        out = subprocess.check_output([sys.executable, '-c', THREADS])
+        self.assertEqual(out.decode().strip(), '[]')
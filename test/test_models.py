@@ -1,12 +1,22 @@
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock
+from xml.etree import ElementTree
+import tempfile
+import threading
+import time
 
-from pgsheets import Spreadsheet
+import pandas as pd
+
+from pgsheets import Spreadsheet, TokenPool
 from pgsheets.models import Worksheet
-from pgsheets.exceptions import PGSheetsHTTPException
+from pgsheets.exceptions import PGSheetsHTTPException, PGSheetsValueError, \
+    PGSheetsBatchException
+from pgsheets.cache import cell_cache, snapshot_cache
+from pgsheets.upload import WriteScheduler
 
 from test.api_content import get_spreadsheet_element, \
-    get_worksheets_feed, get_worksheet_entry
+    get_worksheets_feed, get_worksheet_entry, get_cells_feed, \
+    get_batch_response
 
 
 class MockToken():
@@ -35,10 +45,13 @@ class ApiTest(TestCase):
         self.post = self.post_patch.start()
         self.delete_patch = patch("requests.delete")
         self.delete = self.delete_patch.start()
+        self.put_patch = patch("requests.put")
+        self.put = self.put_patch.start()
 
         self.token = MockToken()
 
     def tearDown(self):
+        self.put_patch.stop()
         self.delete_patch.stop()
         self.post_patch.stop()
         self.get_patch.stop()
@@ -230,3 +243,587 @@ class TestSpreadSheet(ApiTest):
 
         with self.assertRaises(ValueError):
             s.getWorksheet("fake worksheet")
+
+    def test_lazy(self):
+        key = "TESTKEY"
+        s = Spreadsheet(self.token, key, lazy=True)
+        self.assertFalse(self.get.called)
+        self.assertEqual(s.getKey(), key)
+
+        # worksheets can be referenced by id without any API calls
+        w = s.getWorksheetById("od6")
+        self.assertEqual(type(w), Worksheet)
+        self.assertEqual(w._getSheetKey(), key)
+        self.assertEqual(w.getWorksheetId(), "od6")
+        self.assertEqual(
+            repr(w), "<Worksheet title=None sheet_key='TESTKEY'>")
+        self.assertFalse(self.get.called)
+
+        # metadata is retrieved on first use
+        self.get.return_value.status_code = 200
+        self.get.return_value.content = get_worksheet_entry(
+            key, "sheet_title")
+        self.assertEqual(w._loadInfo('title'), "sheet_title")
+        self.checkGetCall(
+            "https://spreadsheets.google.com/feeds/worksheets/{}/private/full/od6"
+            .format(key))
+        self.assertEqual(w._info.rows, 2)
+        self.assertEqual(w._info.cols, 2)
+        self.assertEqual(
+            w._info.edit_uri,
+            "https://spreadsheets.google.com/feeds/worksheets/{}/private/full/od6/CCCC"
+            .format(key))
+        # and not retrieved again
+        self.assertEqual(w._loadInfo('title'), "sheet_title")
+        self.assertFalse(self.get.called)
+
+        self.get.return_value.content = get_spreadsheet_element(
+            key=key, title="my_title")
+        self.assertEqual(s.getTitle(), "my_title")
+        self.checkGetCall(
+            "https://spreadsheets.google.com/feeds/spreadsheets/"
+            "private/full/{}".format(key))
+
+
+class TestWorksheet(ApiTest):
+
+    def getWorksheet(self, key="TESTKEY", title="sheet_title", rows=2,
+                     cols=2):
+        """Helper method to get a Worksheet object from a faked worksheet
+        entry with the given size.
+        """
+        self.get.return_value.status_code = 200
+        self.get.return_value.content = get_worksheet_entry(
+            key, title, rows=rows, cols=cols)
+        w = Spreadsheet(self.token, key, lazy=True).getWorksheetById("od6")
+        w._getFeed()
+        self.get.reset_mock()
+        return w
+
+    def acceptBatches(self, failed=(), responses=()):
+        """Makes the fake API respond to batch updates. The cells in
+        *failed* are reported as not updated, once each. The first responses
+        can be given in *responses*.
+        """
+        failed = set(failed)
+        responses = list(responses)
+
+        def post(url, data, headers):
+            if responses:
+                return responses.pop(0)
+            cells = [(int(c.get('row')), int(c.get('col')))
+                     for c in ElementTree.fromstring(data).iter(
+                         '{http://schemas.google.com/spreadsheets/2006}cell')]
+            content = get_batch_response("TESTKEY", cells, failed)
+            failed.difference_update(cells)
+            return MagicMock(status_code=200, content=content)
+
+        self.post.side_effect = post
+
+    def serveCells(self, cells):
+        """Makes the fake API serve the (row, col, inputValue, value) *cells*
+        from the cells feed, filtered by its row and column query parameters
+        """
+        def get(url, headers, params=None):
+            params = params or {}
+            selected = [
+                c for c in cells
+                if params.get('min-row', 1) <= c[0]
+                <= params.get('max-row', float('inf'))
+                and params.get('min-col', 1) <= c[1]
+                <= params.get('max-col', float('inf'))]
+            return MagicMock(status_code=200,
+                             content=get_cells_feed("TESTKEY", selected))
+
+        self.get.side_effect = get
+
+    def acceptResizes(self):
+        """Makes the fake API accept resizes, responding with the entry"""
+        def put(url, data, headers):
+            entry = ElementTree.fromstring(data)
+            ns = '{http://schemas.google.com/spreadsheets/2006}'
+            return MagicMock(status_code=200, content=get_worksheet_entry(
+                "TESTKEY", "sheet_title",
+                rows=int(entry.find(ns + 'rowCount').text),
+                cols=int(entry.find(ns + 'colCount').text)))
+
+        self.put.side_effect = put
+
+    def test_setDataFrame_known_size(self):
+        w = self.getWorksheet(rows=2, cols=2)
+        self.acceptBatches()
+
+        # the sheet is known to be big enough, so only the cells are posted
+        w.setDataFrame(pd.DataFrame([[1, 2], [3, 4]]),
+                       copy_index=False, copy_columns=False)
+        self.checkPostCall(
+            "https://spreadsheets.google.com/feeds/cells/TESTKEY/od6/"
+            "private/full/batch")
+        self.assertFalse(self.get.called)
+        self.assertFalse(self.put.called)
+
+        # a bigger frame resizes with the known entry, without a GET
+        self.put.return_value.status_code = 200
+        self.put.return_value.content = get_worksheet_entry(
+            "TESTKEY", "sheet_title", rows=3, cols=3)
+        w.setDataFrame(pd.DataFrame([[1, 2], [3, 4]]))
+        self.assertTrue(self.put.called)
+        self.assertFalse(self.get.called)
+        self.assertEqual((w._info.rows, w._info.cols), (3, 3))
+
+    def test_resize_exact(self):
+        w = self.getWorksheet(rows=2, cols=2)
+        self.acceptResizes()
+        # the sheet may have grown elsewhere, so an exact resize is sent
+        # even if it matches the last known size
+        w.resize(2, 2)
+        self.assertEqual(self.put.call_count, 1)
+        w.resizeToAtLeast(2, 2)
+        self.assertEqual(self.put.call_count, 1)
+        self.assertFalse(self.get.called)
+
+    def test_setDataFrame_stale_size(self):
+        w = self.getWorksheet(rows=2, cols=2)
+
+        # the sheet was made smaller elsewhere, so the first post fails
+        self.acceptBatches(
+            responses=[MagicMock(status_code=400, content=b'bad')])
+        self.get.return_value.content = get_worksheet_entry(
+            "TESTKEY", "sheet_title", rows=1, cols=1)
+        self.put.return_value.status_code = 200
+        self.put.return_value.content = get_worksheet_entry(
+            "TESTKEY", "sheet_title", rows=2, cols=2)
+
+        w.setDataFrame(pd.DataFrame([[1, 2], [3, 4]]),
+                       copy_index=False, copy_columns=False)
+        self.checkGetCall()
+        self.assertTrue(self.put.called)
+        self.assertEqual(self.post.call_count, 2)
+
+    def test_asDataFrame(self):
+        w = self.getWorksheet()
+        self.get.return_value.content = get_cells_feed("TESTKEY", [
+            (1, 1, "name", "name"),
+            (1, 2, "value", "value"),
+            (2, 1, "a", "a"),
+            (2, 2, "=1+1", "2"),
+            (3, 1, "b", "b"),
+            ])
+
+        df = w.asDataFrame()
+        self.checkGetCall(
+            "https://spreadsheets.google.com/feeds/cells/TESTKEY/od6/"
+            "private/full")
+        self.assertEqual(list(df.index), ["a", "b"])
+        self.assertEqual(list(df.columns), ["value"])
+        self.assertEqual(df.loc["a", "value"], "=1+1")
+        self.assertTrue(pd.isnull(df.loc["b", "value"]))
+
+        df = w.asDataFrame(values=True)
+        self.assertEqual(df.loc["a", "value"], "2")
+
+        df = w.asDataFrame(set_index=False, set_columns=False)
+        self.assertEqual(df.shape, (3, 2))
+        self.assertEqual(list(df.index), [1, 2, 3])
+        self.assertEqual(list(df.columns), [1, 2])
+        self.assertEqual(df.loc[3, 1], "b")
+
+    def test_getRange(self):
+        cell_cache.clear()
+        w = self.getWorksheet()
+        self.get.return_value.content = get_cells_feed("TESTKEY", [
+            (1, 1, "a", "a"),
+            (1, 2, "=1+1", "2"),
+            (2, 1, "", ""),
+            ])
+        self.assertEqual(w.getRange(1, 1, 2, 2), [["a", "=1+1"], ["", ""]])
+        self.checkGetCall(
+            "https://spreadsheets.google.com/feeds/cells/TESTKEY/od6/"
+            "private/full")
+        self.assertEqual(self.get.call_args[1]['params'], {
+            'min-row': 1, 'max-row': 2, 'min-col': 1, 'max-col': 2,
+            'return-empty': 'true'})
+
+        # cells which have been read are cached
+        self.assertEqual(w.getCell(1, 2, values=True), "2")
+        self.assertEqual(w.getRange(1, 1, 1, 2, values=True), [["a", "2"]])
+        self.assertFalse(self.get.called)
+
+        # and invalidated when written to
+        self.acceptBatches()
+        w._addCells([(1, 2, "b")])
+        self.get.return_value.content = get_cells_feed(
+            "TESTKEY", [(1, 2, "b", "b")])
+        self.assertEqual(w.getCell(1, 2), "b")
+        self.checkGetCall()
+
+    def test_getRange_during_write(self):
+        cell_cache.clear()
+        w = self.getWorksheet()
+        self.get.return_value.content = get_cells_feed(
+            "TESTKEY", [(1, 2, "a", "a")])
+        self.acceptBatches()
+        post = self.post.side_effect
+
+        # a read made while the batch is in progress sees the old content
+        def read_then_post(url, data, headers):
+            self.assertEqual(w.getCell(1, 2), "a")
+            return post(url, data, headers)
+        self.post.side_effect = read_then_post
+
+        w._addCells([(1, 2, "b")])
+        self.get.return_value.content = get_cells_feed(
+            "TESTKEY", [(1, 2, "b", "b")])
+        self.get.reset_mock()
+        self.assertEqual(w.getCell(1, 2), "b")
+        self.assertTrue(self.get.called)
+
+    def test_addCells_retries_failed(self):
+        w = self.getWorksheet()
+        w._BATCH_RETRY_DELAY = 0
+        self.acceptBatches(failed=[(1, 2)])
+        result = w._addCells([(1, 1, "a"), (1, 2, "b"), (2, 1, "c")])
+        self.assertEqual(self.post.call_count, 2)
+        # only the failed cell is sent again
+        retried = ElementTree.fromstring(self.post.call_args[1]['data'])
+        self.assertEqual(
+            [c.get('inputValue') for c in retried.iter(
+                '{http://schemas.google.com/spreadsheets/2006}cell')],
+            ["b"])
+        self.assertEqual((result.cells, result.updated, result.requests),
+                         (3, 3, 2))
+        self.assertEqual(result.failed, [])
+
+        # cells which keep failing raise an exception with the result
+        self.post.reset_mock()
+        self.acceptBatches(failed=[(1, 2)])
+        with self.assertRaises(PGSheetsBatchException) as cm:
+            w._addCells([(1, 1, "a"), (1, 2, "b")], retries=0)
+        self.assertEqual(self.post.call_count, 1)
+        result = cm.exception.result
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(result.failed, [(1, 2, "b", 409, "Conflict")])
+
+    def test_token_pool(self):
+        first, second = MockToken(), MockToken()
+        first.token, second.token = "first", "second"
+        pool = TokenPool([first, second])
+        w = Worksheet(pool, key="TESTKEY", worksheet_id="od6")
+
+        # a throttled request is made again with the other token
+        self.get.side_effect = [
+            MagicMock(status_code=429, content=b'throttled'),
+            MagicMock(status_code=200, content=get_cells_feed(
+                "TESTKEY", [(1, 1, "a", "a")])),
+            ]
+        df = w.asDataFrame(set_index=False, set_columns=False)
+        self.assertEqual(df.loc[1, 1], "a")
+        self.assertEqual(
+            [c[1]['headers']['Authorization']
+             for c in self.get.call_args_list],
+            ["Bearer first", "Bearer second"])
+        usage = pool.getUsage()
+        self.assertEqual([u['throttled'] for u in usage], [1, 0])
+        self.assertEqual([u['in_flight'] for u in usage], [0, 0])
+
+    def test_asDataFrame_columns(self):
+        w = self.getWorksheet()
+        cells = [(row, col, "{}{}".format(name, row - 1), "")
+                 for col, name in enumerate("abcde", 1)
+                 for row in range(2, 4)]
+        cells += [(1, col, name, name) for col, name in enumerate("abcde", 1)]
+        self.serveCells(cells)
+
+        df = w.asDataFrame(columns=['e', 'c', 4])
+        self.assertEqual(list(df.columns), ['e', 'c', 'd'])
+        self.assertEqual(list(df.index), ['a1', 'a2'])
+        self.assertEqual(df.loc['a2', 'e'], 'e2')
+        # the header, then column 1 and columns 3 to 5
+        self.assertEqual(
+            sorted(str(c[1].get('params')) for c in self.get.call_args_list),
+            sorted(str(p) for p in [
+                {'min-row': 1, 'max-row': 1},
+                {'min-col': 1, 'max-col': 1},
+                {'min-col': 3, 'max-col': 5}]))
+
+        self.get.reset_mock()
+        df = w.asDataFrame(set_index=False, set_columns=False, columns=[2])
+        self.assertEqual(df.shape, (3, 1))
+        self.assertEqual(list(df.columns), [2])
+        self.assertEqual(df.loc[3, 2], 'b2')
+        self.assertEqual(self.get.call_count, 1)
+
+        with self.assertRaises(PGSheetsValueError):
+            w.asDataFrame(columns=['missing'])
+
+    def test_asDataFrame_columns_shape(self):
+        w = self.getWorksheet(rows=4, cols=5)
+        cells = [(1, 1, 'a', 'a'), (1, 2, 'v', 'v'), (2, 1, 'a1', 'a1'),
+                 (2, 2, 'v1', 'v1'), (3, 1, 'a2', 'a2'), (4, 1, 'a3', 'a3')]
+        self.serveCells(cells)
+
+        # a projection has the rows of the full read
+        full = w.asDataFrame(set_index=False)
+        df = w.asDataFrame(set_index=False, columns=['v'])
+        self.assertEqual(df.shape, (3, 1))
+        self.assertTrue(df.equals(full[['v']]))
+
+        # requested columns without cells are still included
+        df = w.asDataFrame(set_index=False, set_columns=False, columns=[5, 2])
+        self.assertEqual(list(df.columns), [5, 2])
+        self.assertEqual(df.shape, (4, 2))
+        self.assertTrue(df[5].isnull().all())
+
+        df = w.asDataFrame(set_index=False, set_columns=False, columns=[])
+        self.assertEqual(df.shape, (4, 0))
+
+    def test_asDataFrame_columns_rowCount(self):
+        # the rows come from the cells, not the size of the sheet
+        w = self.getWorksheet(rows=1000, cols=26)
+        self.serveCells([(1, 1, 'k', 'k'), (1, 2, 'v', 'v'),
+                         (2, 1, 'k1', 'k1'), (3, 1, 'k2', 'k2'),
+                         (3, 2, 'v2', 'v2')])
+        full = w.asDataFrame()
+        self.assertEqual(full.shape, (2, 1))
+        for set_index in (True, False):
+            full = w.asDataFrame(set_index=set_index)
+            df = w.asDataFrame(set_index=set_index, columns=['v'])
+            self.assertTrue(df.equals(full[['v']]))
+        self.assertEqual(list(df.index), [2, 3])
+
+    def test_asDataFrame_columns_requests(self):
+        w = self.getWorksheet(rows=3, cols=60)
+        self.serveCells([(1, col, str(col), str(col))
+                         for col in range(1, 61)])
+        running = [0, 0]
+        lock = threading.Lock()
+        serve = self.get.side_effect
+
+        def get(*args, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return serve(*args, **kwargs)
+
+        self.get.side_effect = get
+        # scattered columns are requested a few at a time
+        df = w.asDataFrame(set_columns=False,
+                           columns=list(range(3, 61, 2)))
+        self.assertEqual(df.shape, (1, 29))
+        self.assertEqual(self.get.call_count, 30)
+        self.assertLessEqual(running[1], 8)
+
+    def test_asDataFrames(self):
+        w = self.getWorksheet()
+        self.get.return_value.content = get_cells_feed("TESTKEY", [
+            (1, 1, "name", "name"),
+            (1, 2, "value", "value"),
+            (2, 1, "a", "a"),
+            (2, 2, "=1+1", "2"),
+            ])
+        formulas, values = w.asDataFrames()
+        self.assertEqual(self.get.call_count, 1)
+        pd.testing.assert_frame_equal(formulas, w.asDataFrame())
+        pd.testing.assert_frame_equal(values, w.asDataFrame(values=True))
+        self.assertEqual(formulas.loc["a", "value"], "=1+1")
+        self.assertEqual(values.loc["a", "value"], "2")
+
+    def test_copyTo(self):
+        source = self.getWorksheet(rows=5, cols=2)
+        target = Worksheet(self.token, key="TARGET", worksheet_id="od7")
+        target._info.rows, target._info.cols = 10, 10
+        cells = [(1, 1, "a", "a"), (2, 2, "=1+1", "2"), (5, 1, "b", "b")]
+
+        def get(url, headers, params):
+            return MagicMock(status_code=200, content=get_cells_feed(
+                "TESTKEY", [c for c in cells
+                            if params['min-row'] <= c[0] <= params['max-row']]
+                ))
+
+        self.get.side_effect = get
+        self.acceptBatches()
+        copied = source.copyTo(target, x_pos=2, y_pos=3, chunk_rows=2)
+        self.assertEqual(copied, 3)
+        self.assertEqual(
+            [c[1]['params'] for c in self.get.call_args_list],
+            [{'min-row': 1, 'max-row': 2}, {'min-row': 3, 'max-row': 4},
+             {'min-row': 5, 'max-row': 5}])
+        self.assertFalse(self.put.called)
+
+        posted = [
+            [(c.get('row'), c.get('col'), c.get('inputValue'))
+             for c in ElementTree.fromstring(call[1]['data']).iter(
+                 '{http://schemas.google.com/spreadsheets/2006}cell')]
+            for call in self.post.call_args_list]
+        # the empty middle chunk is not posted
+        self.assertEqual(posted, [[('3', '2', 'a'), ('4', '3', '=1+1')],
+                                  [('7', '2', 'b')]])
+        self.assertTrue(all(
+            call[0][0].startswith(
+                "https://spreadsheets.google.com/feeds/cells/TARGET/od7")
+            for call in self.post.call_args_list))
+
+    def test_setDataFrames(self):
+        w = self.getWorksheet(rows=2, cols=2)
+        self.acceptBatches()
+        self.acceptResizes()
+        chunks = [pd.DataFrame([[i, i * 10]] * 3, columns=['a', 'b'],
+                               index=range(i * 3, i * 3 + 3))
+                  for i in range(4)]
+        written = w.setDataFrames(iter(chunks), copy_index=False)
+        self.assertEqual(written, 2 + 4 * 3 * 2)
+
+        rows = [sorted(set(int(c.get('row')) for c in ElementTree.fromstring(
+            call[1]['data']).iter(
+                '{http://schemas.google.com/spreadsheets/2006}cell')))
+            for call in self.post.call_args_list]
+        self.assertEqual(rows, [[1, 2, 3, 4], [5, 6, 7], [8, 9, 10],
+                                [11, 12, 13]])
+
+        # grown in doubling steps, then trimmed to the data
+        sizes = [int(ElementTree.fromstring(call[1]['data']).find(
+            '{http://schemas.google.com/spreadsheets/2006}rowCount').text)
+            for call in self.put.call_args_list]
+        self.assertEqual(sizes, [4, 8, 16, 13])
+        self.assertEqual((w._info.rows, w._info.cols), (13, 2))
+        self.assertFalse(self.get.called)
+
+    def test_dry_run(self):
+        w = self.getWorksheet(rows=2, cols=2)
+        df = pd.DataFrame([[i, 'x' * i] for i in range(100)])
+
+        estimate = w.setDataFrame(df, dry_run=True)
+        self.assertEqual(estimate.requests, 2)
+        self.assertEqual(estimate.cells, 101 * 3)
+        self.assertEqual(estimate.batches, [101 * 3])
+        self.assertEqual(estimate.resizes, [(101, 3)])
+        self.assertFalse(estimate.exceeds_limit)
+        self.assertEqual(w.resizeToAtLeast(2, 2, dry_run=True).requests, 0)
+        self.assertEqual(w.resize(2, 2, dry_run=True).requests, 1)
+        self.assertTrue(w.resizeToAtLeast(
+            2000, 2000, dry_run=True).exceeds_limit)
+
+        read = w.asDataFrame(dry_run=True)
+        self.assertEqual((read.requests, read.cells), (1, 4))
+        read = w.asDataFrame(columns=[2, 'a'], dry_run=True)
+        self.assertEqual((read.requests, read.cells), (3, 4))
+        self.assertEqual((read + estimate).requests, 5)
+
+        # a worksheet of unknown size is read without retrieving its entry
+        lazy = Spreadsheet(self.token, "TESTKEY", lazy=True).getWorksheetById(
+            "od6")
+        self.assertEqual(lazy.asDataFrame(dry_run=True).requests, 1)
+
+        # with the snapshot cache the entry is always retrieved
+        with tempfile.TemporaryDirectory() as path, \
+                patch.object(snapshot_cache, 'path', path):
+            self.assertEqual(w.asDataFrame(dry_run=True).requests, 2)
+            snapshot_cache.set("TESTKEY", "od6", w._info.updated, [])
+            self.assertEqual(w.asDataFrame(dry_run=True).requests, 1)
+
+        # nothing was sent
+        self.assertFalse(self.get.called)
+        self.assertFalse(self.post.called)
+        self.assertFalse(self.put.called)
+
+        # the estimated request size is close to the real one
+        self.acceptBatches()
+        self.acceptResizes()
+        w.setDataFrame(df)
+        sent = len(self.post.call_args[1]['data'])
+        self.assertLess(abs(estimate.bytes_sent - sent), sent * 0.1)
+
+    def test_watch(self):
+        w = self.getWorksheet()
+        state = {'updated': "2015-07-18T05:29:31.112Z",
+                 'cells': [(1, 1, 'a', 'a'), (1, 2, '=1+1', '2')]}
+
+        def get(url, headers, params=None):
+            if url == w._info.cells_uri:
+                content = get_cells_feed("TESTKEY", state['cells'])
+            else:
+                content = get_worksheet_entry(
+                    "TESTKEY", "sheet_title", updated=state['updated'])
+            return MagicMock(status_code=200, content=content)
+
+        self.get.side_effect = get
+        changes = []
+        watcher = w.watch(lambda worksheet, cells: changes.append(cells),
+                          interval=3600)
+        # the first poll records the cells
+        watcher.stop()
+        self.assertEqual(self.get.call_count, 2)
+
+        # an unchanged worksheet is not read again
+        watcher.poll()
+        self.assertEqual(self.get.call_count, 3)
+        self.assertEqual(changes, [])
+
+        state['updated'] = "2015-07-19T05:29:31.112Z"
+        state['cells'] = [(1, 2, '=1+2', '3'), (2, 1, 'b', 'b')]
+        watcher.poll()
+        self.assertEqual(self.get.call_count, 5)
+        self.assertEqual(changes, [[(1, 1, 'a', ''), (1, 2, '=1+1', '=1+2'),
+                                    (2, 1, '', 'b')]])
+
+    def test_batchWrite(self):
+        w = self.getWorksheet(rows=2, cols=2)
+        self.get.return_value.content = get_worksheets_feed(
+            "TESTKEY", ["sheet_title"])
+        self.acceptBatches()
+        self.acceptResizes()
+        s = Spreadsheet(self.token, "TESTKEY", lazy=True)
+        df = pd.DataFrame([[1, 2], [3, 4]])
+        written = s.batchWrite([
+            ('sheet_title', df, {'copy_index': False}),
+            (w, df, {'x_pos': 3, 'copy_index': False,
+                     'copy_columns': False}),
+            ], batch_size=4)
+        self.assertEqual(written, [6, 4])
+        self.assertEqual(self.put.call_count, 1)
+        self.assertEqual(self.post.call_count, 3)
+        with self.assertRaises(ValueError):
+            s.batchWrite([('missing', df)])
+
+        # the same jobs can be estimated first
+        scheduler = WriteScheduler(batch_size=4)
+        scheduler.add(w, df)
+        scheduler.add(w, df, x_pos=4, resize=True)
+        estimate = scheduler.estimate()
+        self.assertEqual(estimate.resizes, [(3, 6)])
+        self.assertEqual(estimate.batches, [4, 4, 1, 4, 4, 1])
+        self.assertEqual(estimate.requests, 7)
+
+    def test_snapshot_cache(self):
+        w = self.getWorksheet()
+
+        def get(url, headers, params=None):
+            if url == w._info.cells_uri:
+                content = get_cells_feed("TESTKEY", [
+                    (1, 1, 'a', 'a'), (1, 2, 'b', 'b'), (2, 1, '1', '1'),
+                    (2, 2, '=1+1', '2')])
+            else:
+                content = get_worksheet_entry("TESTKEY", "sheet_title")
+            return MagicMock(status_code=200, content=content)
+
+        self.get.side_effect = get
+        with tempfile.TemporaryDirectory() as path, \
+                patch.object(snapshot_cache, 'path', path):
+            expected = w.asDataFrame()
+            self.assertEqual(self.get.call_count, 2)
+
+            # only the entry is retrieved while the snapshot is current
+            for _ in range(2):
+                self.assertTrue(w.asDataFrame().equals(expected))
+            self.assertEqual(self.get.call_count, 4)
+            formulas, values = w.asDataFrames()
+            self.assertEqual(values['b'].tolist(), ['2'])
+            self.assertEqual(self.get.call_count, 5)
+
+        # a cache which cannot be written does not stop reads
+        with tempfile.NamedTemporaryFile() as f, \
+                patch.object(snapshot_cache, 'path', f.name):
+            self.assertTrue(w.asDataFrame().equals(expected))
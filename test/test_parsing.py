@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from pgsheets import parsing
+
+from test.api_content import get_cells_feed, get_batch_response
+
+
+class TestParsing(TestCase):
+
+    def test_backends_identical(self):
+        cells = [
+            (1, 1, "name", "name"),
+            (1, 2, "=1+1", "2"),
+            (2, 1, "", ""),
+            (3, 7, "&lt;tag&gt; &amp; ü", "&lt;tag&gt; &amp; ü"),
+            ]
+        content = get_cells_feed("TESTKEY", cells)
+        expected = [
+            (1, 1, "name", "name"),
+            (1, 2, "=1+1", "2"),
+            (2, 1, "", ""),
+            (3, 7, "<tag> & ü", "<tag> & ü"),
+            ]
+        for backend in parsing.BACKENDS:
+            self.assertEqual(
+                list(parsing.parse_cells(content, backend=backend)),
+                expected, backend)
+        self.assertEqual(list(parsing.parse_cells(content)), expected)
+
+        empty = get_cells_feed("TESTKEY", [])
+        for backend in parsing.BACKENDS:
+            self.assertEqual(
+                list(parsing.parse_cells(empty, backend=backend)), [])
+
+    def test_batch_statuses(self):
+        content = get_batch_response(
+            "TESTKEY", [(1, 1), (1, 2)], failed=[(1, 2)])
+        for backend in parsing.BACKENDS:
+            self.assertEqual(
+                list(parsing.parse_batch_statuses(content, backend)),
+                [("R1C1", 200, "Success"), ("R1C2", 409, "Conflict")],
+                backend)
+
+    def test_split_feed(self):
+        cells = [(row, col, "={}".format(row * col), str(row * col))
+                 for row in range(1, 11) for col in range(1, 4)]
+        content = get_cells_feed("TESTKEY", cells)
+        feeds = parsing.split_feed(content, 4)
+        self.assertEqual(len(feeds), 4)
+        self.assertEqual(
+            [c for feed in feeds for c in parsing.parse_cells(feed)], cells)
+        # more pieces than entries
+        self.assertEqual(
+            len(parsing.split_feed(get_cells_feed("TESTKEY", cells[:2]), 5)),
+            2)
+        self.assertEqual(parsing.split_feed(b'<feed/>', 4), [b'<feed/>'])
+
+        for processes in [None, 3]:
+            pieces = parsing.parse_cell_arrays(content, processes=processes)
+            self.assertEqual(
+                [c for rows, cols, inputs, values in pieces
+                 for c in zip(rows, cols, inputs, values)],
+                cells)
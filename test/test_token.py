@@ -2,8 +2,8 @@ from unittest import TestCase
 from unittest.mock import patch
 import datetime
 
-from pgsheets import Client, Token
-from pgsheets.exceptions import PGSheetsHTTPException
+from pgsheets import Client, Token, TokenPool
+from pgsheets.exceptions import PGSheetsHTTPException, PGSheetsValueError
 
 
 class TestClient(TestCase):
@@ -152,3 +152,82 @@ class TestToken(TestCase):
         with self.assertRaises(PGSheetsHTTPException):
             t.getAuthorizationHeader()
         self.assertFalse(get.called)
+
+
+class FakeToken():
+
+    def __init__(self, name):
+        self.name = name
+
+    def getAuthorizationHeader(self, headers=None):
+        if headers is None:
+            headers = {}
+        headers['Authorization'] = "Bearer " + self.name
+        return headers
+
+
+class TestTokenPool(TestCase):
+
+    def test_round_robin(self):
+        pool = TokenPool([FakeToken('a'), FakeToken('b'), FakeToken('c')])
+        got = [pool.getAuthorizationHeader({'test': 1}) for _ in range(4)]
+        self.assertEqual([h['Authorization'] for h in got],
+                         ['Bearer a', 'Bearer b', 'Bearer c', 'Bearer a'])
+        self.assertEqual(got[0]['test'], 1)
+        usage = pool.getUsage()
+        self.assertEqual([u['requests'] for u in usage], [2, 1, 1])
+        self.assertEqual([u['in_flight'] for u in usage], [2, 1, 1])
+
+        for h in got:
+            self.assertFalse(pool.release(h, 200))
+        self.assertEqual([u['in_flight'] for u in pool.getUsage()],
+                         [0, 0, 0])
+
+    def test_least_loaded(self):
+        pool = TokenPool([FakeToken('a'), FakeToken('b')],
+                         strategy='least-loaded')
+        first = pool.getAuthorizationHeader()
+        second = pool.getAuthorizationHeader()
+        self.assertEqual((first['Authorization'], second['Authorization']),
+                         ('Bearer a', 'Bearer b'))
+        pool.release(second, 200)
+        # 'b' has nothing in progress
+        self.assertEqual(pool.getAuthorizationHeader()['Authorization'],
+                         'Bearer b')
+
+        with self.assertRaises(PGSheetsValueError):
+            TokenPool([FakeToken('a')], strategy='random')
+        with self.assertRaises(PGSheetsValueError):
+            TokenPool([])
+
+    def test_release(self):
+        pool = TokenPool([FakeToken('a')])
+        # requests with the same access token are counted separately
+        first = pool.getAuthorizationHeader()
+        second = pool.getAuthorizationHeader()
+        pool.release(first)
+        self.assertEqual(pool.getUsage()[0]['in_flight'], 1)
+        pool.release(second, 200)
+        self.assertEqual(pool.getUsage()[0]['in_flight'], 0)
+        # the headers are forgotten once released
+        self.assertEqual(pool._headers, {})
+        self.assertFalse(pool.release(second, 200))
+        self.assertEqual(pool.getUsage()[0]['in_flight'], 0)
+
+    def test_cooldown(self):
+        pool = TokenPool([FakeToken('a'), FakeToken('b')], cooldown=60)
+        h = pool.getAuthorizationHeader()
+        # throttled, and 'b' can be used instead
+        self.assertTrue(pool.release(h, 429))
+        for _ in range(3):
+            h = pool.getAuthorizationHeader()
+            self.assertEqual(h['Authorization'], 'Bearer b')
+        # no token left to retry with
+        self.assertFalse(pool.release(h, 429))
+        usage = pool.getUsage()
+        self.assertEqual([u['throttled'] for u in usage], [1, 1])
+        self.assertEqual([u['cooling_down'] for u in usage], [True, True])
+
+        pool._cool_until[0] = 0
+        self.assertEqual(pool.getAuthorizationHeader()['Authorization'],
+                         'Bearer a')
@@ -0,0 +1,124 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+from pgsheets.upload import UploadPlan, WriteScheduler
+from pgsheets.models import _frame_cells
+from pgsheets.exceptions import PGSheetsValueError, PGSheetsHTTPException
+
+
+class TestUploadPlan(TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame([[1, 2, 3], [4, 5, 6], [7, 8, 9]],
+                               columns=['a', 'b', 'c'])
+        self.dir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.dir.name, 'upload.json')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_batches(self):
+        plan = UploadPlan(self.df, batch_size=5)
+        self.assertEqual((plan.rows, plan.cols), (4, 4))
+        self.assertEqual(plan.cells, 16)
+        self.assertEqual(len(plan), 4)
+        batches = list(plan.batches())
+        self.assertEqual([i for i, _ in batches], [0, 1, 2, 3])
+        self.assertEqual([c for _, b in batches for c in b],
+                         list(_frame_cells(self.df)))
+        self.assertEqual(list(plan.batches(3)), batches[3:])
+
+        plan = UploadPlan(self.df, copy_index=False, batch_size=5)
+        self.assertEqual(plan.cells, len(list(_frame_cells(
+            self.df, copy_index=False))))
+
+        with self.assertRaises(PGSheetsValueError):
+            UploadPlan(pd.DataFrame(index=range(2000000), columns=[1]))
+
+    def test_resume(self):
+        worksheet = MagicMock()
+        # the third batch fails
+        worksheet._addCells.side_effect = [
+            None, None, PGSheetsHTTPException("failed")]
+        plan = UploadPlan(self.df, batch_size=5)
+        with self.assertRaises(PGSheetsHTTPException):
+            plan.run(worksheet, checkpoint=self.checkpoint)
+        worksheet.resizeToAtLeast.assert_called_with(4, 4)
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['completed'], 2)
+
+        # a different upload cannot use the checkpoint
+        with self.assertRaises(PGSheetsValueError):
+            UploadPlan(self.df + 1, batch_size=5).run(
+                worksheet, checkpoint=self.checkpoint)
+
+        # only the remaining batches are written when resumed
+        worksheet._addCells.reset_mock()
+        worksheet._addCells.side_effect = None
+        UploadPlan(self.df, batch_size=5).run(
+            worksheet, checkpoint=self.checkpoint)
+        sent = [c[0][0] for c in worksheet._addCells.call_args_list]
+        self.assertEqual(sent, [b for _, b in plan.batches(2)])
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+
+class TestWriteScheduler(TestCase):
+
+    def worksheet(self, key, worksheet_id, sent):
+        worksheet = MagicMock()
+        worksheet._info.sheet_key = key
+        worksheet._info.worksheet_id = worksheet_id
+        worksheet._addCells.side_effect = lambda cells: sent.append(
+            (key, worksheet_id, len(cells)))
+        return worksheet
+
+    def test_run(self):
+        sent = []
+        a1 = self.worksheet('A', 'od1', sent)
+        a2 = self.worksheet('A', 'od2', sent)
+        b1 = self.worksheet('B', 'od1', sent)
+        df = pd.DataFrame([[1, 2], [3, 4], [5, 6]])
+        progress = []
+        scheduler = WriteScheduler(
+            max_workers=1, batch_size=4,
+            progress=lambda *args: progress.append(args))
+        scheduler.add(a1, df, copy_columns=False)
+        scheduler.add(a1, df, x_pos=4, copy_columns=False, resize=True)
+        scheduler.add(a2, df.iloc[:2], copy_index=False, copy_columns=False)
+        scheduler.add(b1, df)
+
+        written = scheduler.run()
+        # each worksheet is resized once, to fit all of its frames
+        a1.resize.assert_called_once_with(3, 6)
+        a2.resizeToAtLeast.assert_called_once_with(2, 2)
+        b1.resizeToAtLeast.assert_called_once_with(4, 3)
+
+        # spreadsheets take turns, as do the frames of a spreadsheet
+        self.assertEqual(written, [9, 9, 4, 12])
+        self.assertEqual(sent, [
+            ('A', 'od1', 4), ('B', 'od1', 4), ('A', 'od1', 4),
+            ('B', 'od1', 4), ('A', 'od2', 4), ('B', 'od1', 4),
+            ('A', 'od1', 4), ('A', 'od1', 4), ('A', 'od1', 1),
+            ('A', 'od1', 1)])
+        self.assertEqual(progress[:2], [(0, 4, 9), (3, 4, 12)])
+        self.assertEqual(progress[-1], (1, 9, 9))
+
+    def test_error(self):
+        sent = []
+        a1 = self.worksheet('A', 'od1', sent)
+        def add_cells(cells):
+            sent.append(cells)
+            if len(sent) == 2:
+                raise PGSheetsHTTPException("failed")
+        a1._addCells.side_effect = add_cells
+        scheduler = WriteScheduler(max_workers=2, batch_size=1)
+        scheduler.add(a1, pd.DataFrame([[1, 2], [3, 4]]))
+        with self.assertRaises(PGSheetsHTTPException):
+            scheduler.run()
+        # no batches are started after the error
+        self.assertLessEqual(len(sent), 3)
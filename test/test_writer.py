@@ -0,0 +1,95 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+import threading
+
+from pgsheets.writer import CellWriter
+from pgsheets.exceptions import PGSheetsHTTPException
+
+
+class TestCellWriter(TestCase):
+
+    def setUp(self):
+        self.worksheet = MagicMock()
+
+    def sentCells(self):
+        return [call[0][0] for call in self.worksheet._addCells.call_args_list]
+
+    def test_coalesce(self):
+        with CellWriter(self.worksheet, max_delay=60) as writer:
+            writer.setCell(1, 1, 'a')
+            writer.setCell(1, 2, 'b')
+            writer.setCell(1, 1, 'c')
+            writer.setRange(2, 1, [[1, None]])
+            self.assertFalse(self.worksheet._addCells.called)
+        self.assertEqual(self.sentCells(),
+                         [[(1, 2, 'b'), (1, 1, 'c'), (2, 1, '1'),
+                           (2, 2, '')]])
+        with self.assertRaises(ValueError):
+            writer.setCell(1, 1, 'd')
+
+    def test_max_cells(self):
+        writer = CellWriter(self.worksheet, max_cells=2, max_delay=60)
+        writer.setCell(1, 1, 'a')
+        writer.setCell(1, 1, 'b')
+        self.assertFalse(self.worksheet._addCells.called)
+        writer.setCell(1, 2, 'c')
+        self.assertEqual(self.sentCells(), [[(1, 1, 'b'), (1, 2, 'c')]])
+        writer.close()
+        # nothing left to write
+        self.assertEqual(self.sentCells()[-1], [])
+
+    def test_max_delay(self):
+        sent = threading.Event()
+        self.worksheet._addCells.side_effect = lambda cells: sent.set()
+        writer = CellWriter(self.worksheet, max_delay=0.01)
+        writer.setCell(1, 1, 'a')
+        self.assertTrue(sent.wait(5))
+        self.assertEqual(self.sentCells(), [[(1, 1, 'a')]])
+
+    def test_threads(self):
+        writer = CellWriter(self.worksheet, max_cells=50, max_delay=60)
+
+        def write(col):
+            for row in range(1, 101):
+                writer.setCell(row, col, row)
+
+        threads = [threading.Thread(target=write, args=(col,))
+                   for col in range(1, 5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        writer.close()
+        cells = [c for batch in self.sentCells() for c in batch]
+        self.assertEqual(len(cells), 400)
+        self.assertEqual(len(set((r, c) for r, c, v in cells)), 400)
+
+    def test_failed_flush(self):
+        self.worksheet._addCells.side_effect = [
+            PGSheetsHTTPException("503"), None]
+        writer = CellWriter(self.worksheet, max_delay=60)
+        writer.setRange(1, 1, [['a', 'b']])
+        with self.assertRaises(PGSheetsHTTPException):
+            writer.flush()
+        # the failed cells are kept, behind newer values
+        writer.setCell(1, 2, 'c')
+        writer.close()
+        self.assertEqual(self.sentCells(), [[(1, 1, 'a'), (1, 2, 'b')],
+                                            [(1, 1, 'a'), (1, 2, 'c')]])
+
+    def test_failed_timed_flush(self):
+        failed = threading.Event()
+
+        def add_cells(cells):
+            if not failed.is_set():
+                failed.set()
+                raise PGSheetsHTTPException("503")
+        self.worksheet._addCells.side_effect = add_cells
+        writer = CellWriter(self.worksheet, max_delay=0.01)
+        writer.setCell(1, 1, 'a')
+        self.assertTrue(failed.wait(5))
+        # wait for the failed flush to finish
+        with writer._flush_lock:
+            pass
+        writer.close()
+        self.assertEqual(self.sentCells()[-1], [(1, 1, 'a')])